@@ -0,0 +1,121 @@
+import asyncio
+import logging
+import math
+import time
+from contextlib import asynccontextmanager
+from typing import Any, Dict, Optional
+
+from app.settings import get_settings
+
+# Configure logger
+logger = logging.getLogger(__name__)
+
+
+class AdmissionRejected(Exception):
+    """
+    Raised when a request is shed: 429 when the wait queue is full, 503 when it waited too long.
+    """
+
+    def __init__(self, status_code: int, detail: str, retry_after: int):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """
+    Per-process cap on concurrent synchronous discoveries with a bounded wait queue.
+
+    Up to sync_query_max_concurrent requests run at once and up to sync_query_max_queued
+    more wait for a slot, each for at most sync_query_queue_timeout_seconds. Anything
+    beyond that is rejected immediately so the process stays responsive under bursts.
+    Retry-After is estimated from the average duration of recent discoveries.
+    A sync_query_max_concurrent of 0 disables admission control.
+    """
+
+    def __init__(self):
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self.running = 0
+        self.waiting = 0
+        self.admitted = 0
+        self.rejected = {"queue_full": 0, "timeout": 0}
+        self._avg_duration: Optional[float] = None
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(get_settings().sync_query_max_concurrent)
+        return self._semaphore
+
+    @property
+    def enabled(self) -> bool:
+        return get_settings().sync_query_max_concurrent > 0
+
+    @property
+    def at_capacity(self) -> bool:
+        return self.enabled and self._get_semaphore().locked()
+
+    def retry_after(self) -> int:
+        """
+        Seconds until a slot is likely to be free for a new request.
+        """
+        settings = get_settings()
+        if self._avg_duration is None:
+            return settings.sync_query_retry_after_seconds
+        ahead = (self.waiting + 1) / max(settings.sync_query_max_concurrent, 1)
+        return max(1, math.ceil(self._avg_duration * ahead))
+
+    async def _acquire(self):
+        settings = get_settings()
+        semaphore = self._get_semaphore()
+        if not semaphore.locked():
+            await semaphore.acquire()
+            return
+        if self.waiting >= settings.sync_query_max_queued:
+            self.rejected["queue_full"] += 1
+            raise AdmissionRejected(429, "Too many concurrent supplier queries, try again later or use /discovery/query/async", self.retry_after())
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(semaphore.acquire(), timeout=settings.sync_query_queue_timeout_seconds)
+        except asyncio.TimeoutError:
+            self.rejected["timeout"] += 1
+            raise AdmissionRejected(503, "Timed out waiting for a supplier query slot, try again later or use /discovery/query/async", self.retry_after())
+        finally:
+            self.waiting -= 1
+
+    @asynccontextmanager
+    async def admit(self):
+        """
+        Hold a slot for the duration of a synchronous discovery, or raise AdmissionRejected.
+        """
+        if not self.enabled:
+            yield
+            return
+        await self._acquire()
+        self.admitted += 1
+        self.running += 1
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.running -= 1
+            self._get_semaphore().release()
+            duration = time.perf_counter() - started
+            # Exponentially weighted, so Retry-After follows the current upstream latency
+            self._avg_duration = duration if self._avg_duration is None else 0.8 * self._avg_duration + 0.2 * duration
+
+    def report(self) -> Dict[str, Any]:
+        settings = get_settings()
+        return {
+            "enabled": self.enabled,
+            "max_concurrent": settings.sync_query_max_concurrent,
+            "max_queued": settings.sync_query_max_queued,
+            "running": self.running,
+            "waiting": self.waiting,
+            "admitted": self.admitted,
+            "rejected": dict(self.rejected),
+            "avg_duration_seconds": round(self._avg_duration, 3) if self._avg_duration is not None else None,
+        }
+
+
+sync_query_admission = AdmissionController()
@@ -1,36 +1,19 @@
-import os
 import json
+import asyncio
 import traceback
 from typing import List, Dict, Any
-from anthropic import Anthropic
-from dotenv import load_dotenv
 import logging
 from datetime import datetime
 
-from app.models.supplier import Supplier
+import anthropic
+
+from app.clients import get_anthropic_client
+from app.models.supplier import Supplier, SUPPLIER_FACT_FIELDS
 from app.models.search_result import SearchResult
 
 # Configure logger
 logger = logging.getLogger(__name__)
 
-# Load environment variables
-load_dotenv()
-logger.debug("Environment variables loaded in summarizer.py")
-
-# Initialize Anthropic client
-ANTHROPIC_API_KEY = os.getenv("ANTHROPIC_API_KEY")
-if not ANTHROPIC_API_KEY:
-    logger.error("ANTHROPIC_API_KEY is not set in environment variables")
-else:
-    logger.debug("ANTHROPIC_API_KEY found in environment variables")
-
-try:
-    anthropic_client = Anthropic(api_key=ANTHROPIC_API_KEY)
-    logger.debug("Anthropic client initialized successfully in summarizer module")
-except Exception as e:
-    logger.error(f"Failed to initialize Anthropic client in summarizer: {str(e)}")
-    raise e
-
 async def process_search_result(search_result: SearchResult) -> List[Supplier]:
     """
     Process a raw search result from Claude's web search into structured supplier objects.
@@ -42,8 +25,12 @@ async def process_search_result(search_result: SearchResult) -> List[Supplier]:
         
     Returns:
         List of structured Supplier objects
+
+    Raises:
+        anthropic.APIError: when the extraction call to Claude fails, so the caller can
+        retry it (the worker resumes from the saved search result)
     """
-    logger.info(f"Processing search result for {search_result.query_component} in {search_result.query_country}")
+    logger.info("Processing search result for %s in %s", search_result.query_component, search_result.query_country)
     
     try:
         # Parse the raw AI response which now contains only text objects
@@ -54,7 +41,7 @@ async def process_search_result(search_result: SearchResult) -> List[Supplier]:
         for text_obj in text_objects:
             text_content += text_obj.get("text", "")
         
-        logger.debug(f"Extracted {len(text_content)} characters of text content from {len(text_objects)} text objects")
+        logger.debug("Extracted %s characters of text content from %s text objects", len(text_content), len(text_objects))
 
         # Define tool that accepts an array of suppliers in a single call
         tools = [
@@ -136,12 +123,26 @@ async def process_search_result(search_result: SearchResult) -> List[Supplier]:
 
         Important: Make only ONE call to the create_suppliers tool with ALL suppliers in a single array.
         """
+        if search_result.is_incremental:
+            known_list = "\n".join(f"        - {name}" for name in search_result.known_suppliers)
+            prompt += f"""
+        This research is an INCREMENTAL update. We already have full profiles for these suppliers:
+{known_list}
+
+        - For NEW suppliers, extract every field as usual.
+        - For suppliers in the list above, use the name exactly as written and fill in ONLY the fields whose
+          facts changed according to the research; leave all other fields out.
+        - Do not include known suppliers that have no changes.
+        - If the research contains no new suppliers and no changes, call create_suppliers with an empty array.
+        """
         
         # Call to Claude with tool definition
         logger.debug("Making call to Claude with tool to extract multiple suppliers in one call")
         start_time = datetime.now()
         
-        response = anthropic_client.messages.create(
+        # Run the blocking SDK call in a thread so concurrent extractions overlap
+        response = await asyncio.to_thread(
+            get_anthropic_client().messages.create,
             model="claude-3-5-haiku-20241022",
             max_tokens=8000,
             temperature=0.1,  # Low temperature for accurate information extraction
@@ -156,7 +157,7 @@ async def process_search_result(search_result: SearchResult) -> List[Supplier]:
         
         end_time = datetime.now()
         duration = (end_time - start_time).total_seconds()
-        logger.info(f"Claude extraction completed in {duration} seconds")
+        logger.info("Claude extraction completed in %s seconds", duration)
         
         # Process the response
         suppliers = []
@@ -169,39 +170,44 @@ async def process_search_result(search_result: SearchResult) -> List[Supplier]:
             if getattr(item, 'type', None) == 'text':
                 text_output += getattr(item, 'text', '')
             elif getattr(item, 'type', None) == 'tool_use' and getattr(item, 'name', None) == 'create_suppliers':
-                logger.debug(f"Found create_suppliers tool call")
+                logger.debug("Found create_suppliers tool call")
                 tool_input = getattr(item, 'input', {})
                 supplier_list = tool_input.get('suppliers', [])
                 
-                logger.info(f"Extracted {len(supplier_list)} suppliers in a single tool call")
+                logger.info("Extracted %s suppliers in a single tool call", len(supplier_list))
                 
                 # Process each supplier in the array
                 for i, supplier_data in enumerate(supplier_list):
-                    logger.debug(f"Processing supplier {i+1}/{len(supplier_list)}: {supplier_data.get('name', 'Unknown')}")
+                    logger.debug("Processing supplier %s/%s: %s", i+1, len(supplier_list), supplier_data.get('name', 'Unknown'))
                     
+                    # Only pass the facts that were extracted, so that merging into an
+                    # existing supplier (see app.suppliers) never overwrites known facts with None
+                    facts = {
+                        field: supplier_data[field]
+                        for field in SUPPLIER_FACT_FIELDS
+                        if supplier_data.get(field) is not None
+                    }
                     supplier = Supplier(
                         name=supplier_data.get('name', 'Unknown'),
-                        website=supplier_data.get('website'),
-                        location=supplier_data.get('location'),
-                        product=supplier_data.get('product'),
                         component_type=search_result.query_component,
                         country=search_result.query_country,
-                        lead_time_days=supplier_data.get('lead_time_days'),
-                        min_order_qty=supplier_data.get('min_order_qty'),
-                        certifications=supplier_data.get('certifications', []),
                         raw_ai_source=json.dumps(supplier_data),
-                        summary=supplier_data.get('summary')
+                        **facts
                     )
                     suppliers.append(supplier)
         
-        # If Claude didn't find any suppliers, create a fallback supplier
-        if not suppliers:
+        # If Claude didn't find any suppliers, create a fallback supplier.
+        # An empty incremental result just means nothing new or changed was found.
+        if not suppliers and search_result.is_incremental:
+            logger.info("Incremental search found no new or changed suppliers")
+        elif not suppliers:
             logger.warning("No suppliers identified using Claude's function calling, using fallback")
             fallback_supplier = Supplier(
                 name=f"AI Search Results: {search_result.query_component} in {search_result.query_country}",
                 component_type=search_result.query_component,
                 country=search_result.query_country,
                 raw_ai_source=search_result.raw_ai_response,
+                placeholder=True,
                 summary=f"These are raw search results that need manual processing. Search ID: {search_result.id}"
             )
             suppliers.append(fallback_supplier)
@@ -209,15 +215,21 @@ async def process_search_result(search_result: SearchResult) -> List[Supplier]:
         # Update the search result as processed
         search_result.is_processed = True
         await search_result.save()
-        logger.info(f"Marked search result {search_result.id} as processed")
+        logger.info("Marked search result %s as processed", search_result.id)
         
-        logger.info(f"Extracted {len(suppliers)} suppliers from search result")
+        logger.info("Extracted %s suppliers from search result", len(suppliers))
         return suppliers
         
+    except anthropic.APIError as e:
+        # Upstream failures (like an API 500) may pass: let the caller retry the extraction
+        # instead of storing an error placeholder in place of the suppliers
+        logger.error("Claude API error while processing search result %s: %s", search_result.id, e)
+        raise
+
     except Exception as e:
         error_traceback = traceback.format_exc()
-        logger.error(f"Error processing search result: {str(e)}")
-        logger.debug(f"Full traceback: {error_traceback}")
+        logger.error("Error processing search result: %s", e)
+        logger.debug("Full traceback: %s", error_traceback)
         
         # Create fallback supplier with error message
         fallback_supplier = Supplier(
@@ -225,6 +237,7 @@ async def process_search_result(search_result: SearchResult) -> List[Supplier]:
             component_type=search_result.query_component,
             country=search_result.query_country,
             raw_ai_source=search_result.raw_ai_response,
+            placeholder=True,
             summary=f"Error occurred while processing search results: {str(e)}"
         )
         
@@ -1,44 +1,22 @@
-import os
 import json
-from typing import List, Dict, Any
-from anthropic import Anthropic
+import asyncio
+from typing import List, Dict, Any, Optional
 import traceback
 from datetime import datetime
-from dotenv import load_dotenv
 import logging
 
-from app.models.supplier import Supplier
+from app.clients import get_anthropic_client
 from app.models.search_result import SearchResult
+from app.ratelimit import search_rate_limiter
 
 # Configure logger
 logger = logging.getLogger(__name__)
 
-# Load environment variables
-load_dotenv()
-logger.debug("Environment variables loaded in web_search.py")
-
-ANTHROPIC_API_KEY = os.getenv("ANTHROPIC_API_KEY")
-if not ANTHROPIC_API_KEY:
-    logger.error("ANTHROPIC_API_KEY is not set in environment variables")
-else:
-    logger.debug("ANTHROPIC_API_KEY found in environment variables")
-
-try:
-    anthropic_client = Anthropic(api_key=ANTHROPIC_API_KEY)
-    logger.debug("Anthropic client initialized successfully")
-except Exception as e:
-    logger.error(f"Failed to initialize Anthropic client: {str(e)}")
-    raise e
-
-async def search_suppliers(component: str, country: str) -> SearchResult:
+def build_full_prompt(component: str, country: str) -> str:
     """
-    Use Claude with web search capability to find suppliers based on components and country.
-    Store the raw Claude response in a SearchResult object for later processing.
+    Prompt for a first-time search: full analysis of the top suppliers.
     """
-    logger.info(f"Starting supplier search for component: '{component}' in country: '{country}'")
-    
-    # Create prompt for a procurement specialist with detailed instructions
-    prompt = f"""Given I'm a senior category manager for a company that manufactures appliances, I need a comprehensive procurement analysis for suppliers of {component} in {country}.
+    return f"""Given I'm a senior category manager for a company that manufactures appliances, I need a comprehensive procurement analysis for suppliers of {component} in {country}.
 
     As an experienced procurement specialist, provide me with in-depth research on the top suppliers, covering:
     
@@ -95,47 +73,98 @@ async def search_suppliers(component: str, country: str) -> SearchResult:
     Provide at least 5 diverse suppliers if possible, with comprehensive analysis for each.
     Ensure your assessments include both objective factors and subjective procurement insights that would help with sourcing decisions.
     """
+
+def build_incremental_prompt(component: str, country: str, known_suppliers: List[Dict[str, Any]]) -> str:
+    """
+    Prompt for a delta search: only suppliers we don't have yet, plus changed facts for known ones.
+    """
+    known_lines = "\n".join(
+        f"    - {supplier['name']}" + (f" ({supplier['website']})" if supplier.get('website') else "")
+        for supplier in known_suppliers
+    )
+    return f"""Given I'm a senior category manager for a company that manufactures appliances, I am refreshing an existing procurement analysis of suppliers of {component} in {country}.
+
+    We ALREADY have full profiles for these suppliers:
+{known_lines}
+
+    Do NOT repeat the analysis of the suppliers above. Instead:
+
+    1. NEW SUPPLIERS: search for relevant suppliers of {component} in {country} that are NOT in the list above.
+       For each one provide: company name, website URL, headquarters location, product offerings related to {component},
+       lead times, minimum order quantities, certifications, and a concise procurement assessment
+       (strengths, weaknesses, risk on a 1-10 scale, fit for appliance manufacturers).
+
+    2. CHANGED FACTS: for suppliers in the list above, report ONLY facts that have materially changed recently
+       (e.g. new certifications, changed lead times or MOQs, new website, relocation, acquisitions, closures, supply disruptions).
+       Use the supplier name exactly as written in the list. Skip suppliers with no changes.
+
+    Keep the answer focused on the delta. If nothing new or changed is found, say so briefly.
+    Return the results in a structured JSON format if possible.
+
+    Today's date is {datetime.now().strftime('%Y-%m-%d')}.
+    """
+
+async def search_suppliers(component: str, country: str, known_suppliers: Optional[List[Dict[str, Any]]] = None) -> SearchResult:
+    """
+    Use Claude with web search capability to find suppliers based on components and country.
+    Store the raw Claude response in a SearchResult object for later processing.
+
+    If known_suppliers (dicts with name/website) is given, run an incremental search that
+    only asks for suppliers we don't have yet and for changed facts about the known ones,
+    with a much smaller token budget.
+    """
+    logger.info("Starting supplier search for component: '%s' in country: '%s'", component, country)
+    incremental = bool(known_suppliers)
+    
+    if incremental:
+        logger.info("Running incremental search against %s known suppliers", len(known_suppliers))
+        prompt = build_incremental_prompt(component, country, known_suppliers)
+        max_tokens, thinking_budget = 8192, 4096
+        web_search_tool = {"name": "web_search", "type": "web_search_20250305", "max_uses": 5}
+    else:
+        # Create prompt for a procurement specialist with detailed instructions
+        prompt = build_full_prompt(component, country)
+        max_tokens, thinking_budget = 20688, 15331
+        web_search_tool = {"name": "web_search", "type": "web_search_20250305"}
     logger.debug("Supplier search prompt created")
     
     try:
         # Call Claude API with web search enabled
         logger.debug("Preparing to call Claude API with web search enabled")
-        logger.info(f"Using Claude model: claude-3-7-sonnet-20250219 for supplier search")
+        logger.info("Using Claude model: claude-3-7-sonnet-20250219 for supplier search")
         
-        start_time = datetime.now()
-        logger.debug(f"Claude API call started at: {start_time.isoformat()}")
-        
-        response = anthropic_client.beta.messages.create(
-            model="claude-3-7-sonnet-20250219",
-            max_tokens=20688,
-            temperature=1,  # Slightly higher temperature for more diverse insights
-            messages=[
-                {
-                    "role": "user",
-                    "content": [
-                        {
-                            "type": "text",
-                            "text": prompt
-                        }
-                    ]
-                }
-            ],
-            tools=[
-                {
-                    "name": "web_search",
-                    "type": "web_search_20250305"
-                }
-            ],
-            thinking={
-                "type": "enabled",
-                "budget_tokens": 15331
-            },
-            betas=["web-search-2025-03-05"]
-        )
+        async with search_rate_limiter.slot():
+            start_time = datetime.now()
+            logger.debug("Claude API call started at: %s", start_time.isoformat())
+            
+            # Run the blocking SDK call in a thread so concurrent searches overlap
+            response = await asyncio.to_thread(
+                get_anthropic_client().beta.messages.create,
+                model="claude-3-7-sonnet-20250219",
+                max_tokens=max_tokens,
+                temperature=1,  # Slightly higher temperature for more diverse insights
+                messages=[
+                    {
+                        "role": "user",
+                        "content": [
+                            {
+                                "type": "text",
+                                "text": prompt
+                            }
+                        ]
+                    }
+                ],
+                tools=[web_search_tool],
+                thinking={
+                    "type": "enabled",
+                    "budget_tokens": thinking_budget
+                },
+                betas=["web-search-2025-03-05"]
+            )
         
         end_time = datetime.now()
         duration = (end_time - start_time).total_seconds()
-        logger.info(f"Claude API call completed in {duration} seconds")
+        logger.info("Claude API call completed in %s seconds", duration)
         
         # Filter the content to only include items with type 'text'
         content_items = response.content
@@ -149,7 +178,7 @@ async def search_suppliers(component: str, country: str) -> SearchResult:
                # "citations": getattr(text_object, 'citations', [])
             })
             
-        logger.debug(f"Extracted {len(text_content)} text objects from Claude response")
+        logger.debug("Extracted %s text objects from Claude response", len(text_content))
         
         # Store only the filtered text content as JSON
         raw_content = json.dumps(text_content)
@@ -157,15 +186,17 @@ async def search_suppliers(component: str, country: str) -> SearchResult:
         search_result = SearchResult(
             query_component=component,
             query_country=country,
-            raw_ai_response=raw_content
+            raw_ai_response=raw_content,
+            is_incremental=incremental,
+            known_suppliers=[supplier["name"] for supplier in known_suppliers or []]
         )
-        logger.info(f"Created SearchResult for {component} in {country}")
+        logger.info("Created SearchResult for %s in %s", component, country)
         return search_result
             
     except Exception as e:
         error_traceback = traceback.format_exc()
-        logger.error(f"Error searching suppliers: {str(e)}")
-        logger.debug(f"Full traceback: {error_traceback}")
+        logger.error("Error searching suppliers: %s", e)
+        logger.debug("Full traceback: %s", error_traceback)
         
         # Check for specific error types to provide more helpful messaging
         if "status_code=401" in str(e):
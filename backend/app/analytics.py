@@ -0,0 +1,211 @@
+"""
+Supplier analytics computed with MongoDB aggregation pipelines and materialized into
+the supplier_summaries collection, one document per component/country pair. Components
+are grouped by their canonical key (app.canonical), so spelling variants share a summary.
+
+save_suppliers refreshes the summary of every pair it touches, so dashboards read a
+single indexed document instead of aggregating the supplier collection per request.
+To rebuild all summaries (from the backend directory):
+
+    python -m app.analytics
+"""
+import asyncio
+import logging
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from app.canonical import component_key
+from app.models.supplier import Supplier
+from app.models.supplier_summary import CertificationCount, NumericDistribution, SupplierSummary
+
+# Configure logger
+logger = logging.getLogger(__name__)
+
+# Bucket boundaries for the numeric distributions (lower bounds, inclusive)
+LEAD_TIME_BUCKETS = [0, 7, 14, 30, 60, 90]
+MOQ_BUCKETS = [0, 10, 100, 1000, 10000]
+
+
+def _bucket_label(low: int, high: Optional[int]) -> str:
+    return f"{low}+" if high is None else f"{low}-{high - 1}"
+
+
+def _bucket_expression(field: str, boundaries: List[int]) -> Dict[str, Any]:
+    """
+    Aggregation expression mapping a numeric field to its bucket label, or "unknown".
+    """
+    branches = [
+        {"case": {"$lt": [f"${field}", high]}, "then": _bucket_label(low, high)}
+        for low, high in zip(boundaries, boundaries[1:])
+    ]
+    return {
+        "$cond": [
+            {"$gt": [f"${field}", None]},
+            {"$switch": {"branches": branches, "default": _bucket_label(boundaries[-1], None)}},
+            "unknown",
+        ]
+    }
+
+
+def summary_pipeline(match: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """
+    Per component/country counts, lead time and MOQ statistics and bucket labels.
+    """
+    group = {
+        "_id": {"component_key": "$component_key", "country": "$country"},
+        "component_type": {"$max": "$component_type"},
+        "supplier_count": {"$sum": 1},
+    }
+    for field, boundaries in (("lead_time_days", LEAD_TIME_BUCKETS), ("min_order_qty", MOQ_BUCKETS)):
+        group[f"{field}_known"] = {"$sum": {"$cond": [{"$gt": [f"${field}", None]}, 1, 0]}}
+        group[f"{field}_min"] = {"$min": f"${field}"}
+        group[f"{field}_max"] = {"$max": f"${field}"}
+        group[f"{field}_avg"] = {"$avg": f"${field}"}
+        group[f"{field}_buckets"] = {"$push": _bucket_expression(field, boundaries)}
+    return [{"$match": match}, {"$group": group}]
+
+
+def certification_pipeline(match: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """
+    Number of suppliers holding each certification, per component/country.
+    """
+    return [
+        {"$match": match},
+        {"$unwind": "$certifications"},
+        {"$group": {
+            "_id": {"component_key": "$component_key", "country": "$country", "name": "$certifications"},
+            "count": {"$sum": 1},
+        }},
+    ]
+
+
+def _distribution(row: Dict[str, Any], field: str) -> NumericDistribution:
+    buckets = {}
+    for label in row[f"{field}_buckets"]:
+        if label != "unknown":
+            buckets[label] = buckets.get(label, 0) + 1
+    avg = row[f"{field}_avg"]
+    return NumericDistribution(
+        known=row[f"{field}_known"],
+        min=row[f"{field}_min"],
+        max=row[f"{field}_max"],
+        avg=round(avg, 2) if avg is not None else None,
+        buckets=buckets,
+    )
+
+
+async def compute_summaries(match: Dict[str, Any]) -> List[SupplierSummary]:
+    """
+    Run the aggregation pipelines for the suppliers matching a filter.
+    """
+    collection = Supplier.get_motor_collection()
+    rows = await collection.aggregate(summary_pipeline(match)).to_list(length=None)
+    certification_rows = await collection.aggregate(certification_pipeline(match)).to_list(length=None)
+
+    certifications = {}
+    for row in certification_rows:
+        key = (row["_id"]["component_key"], row["_id"]["country"])
+        certifications.setdefault(key, []).append((row["_id"]["name"], row["count"]))
+
+    summaries = []
+    now = datetime.utcnow()
+    for row in rows:
+        key = (row["_id"]["component_key"], row["_id"]["country"])
+        if key[0] is None:
+            # Stored before component keys existed; summarized once the key is backfilled
+            continue
+        count = row["supplier_count"]
+        summaries.append(SupplierSummary(
+            component_type=row["component_type"],
+            component_key=key[0],
+            country=key[1],
+            supplier_count=count,
+            lead_time_days=_distribution(row, "lead_time_days"),
+            min_order_qty=_distribution(row, "min_order_qty"),
+            certifications=[
+                CertificationCount(name=name, count=certified, share=round(certified / count, 4))
+                for name, certified in sorted(certifications.get(key, []), key=lambda item: (-item[1], item[0]))
+            ],
+            updated_at=now,
+        ))
+    return summaries
+
+
+async def _store_summary(summary: SupplierSummary):
+    document = summary.model_dump(exclude={"id", "revision_id"})
+    await SupplierSummary.get_motor_collection().replace_one(
+        {"component_key": summary.component_key, "country": summary.country},
+        document,
+        upsert=True,
+    )
+
+
+async def refresh_supplier_summary(component_key: str, country: str):
+    """
+    Recompute the summary of one component/country pair after its suppliers changed.
+    Only that pair's suppliers are aggregated, through the component/country index.
+    """
+    summaries = await compute_summaries({"component_key": component_key, "country": country})
+    if not summaries:
+        await SupplierSummary.get_motor_collection().delete_one({"component_key": component_key, "country": country})
+        return
+    await _store_summary(summaries[0])
+    logger.debug("Refreshed supplier summary for %s in %s", component_key, country)
+
+
+async def rebuild_supplier_summaries() -> int:
+    """
+    Recompute every summary from scratch (backfill, or after bulk changes).
+    Returns the number of component/country pairs summarized.
+    """
+    summaries = await compute_summaries({})
+    # Summaries from before component keys existed were per spelling
+    await SupplierSummary.get_motor_collection().delete_many({"component_key": None})
+    for summary in summaries:
+        await _store_summary(summary)
+    pairs = {(summary.component_key, summary.country) for summary in summaries}
+    stale = [
+        summary.id
+        for summary in await SupplierSummary.find_all().to_list()
+        if (summary.component_key, summary.country) not in pairs
+    ]
+    if stale:
+        await SupplierSummary.find({"_id": {"$in": stale}}).delete()
+    logger.info("Rebuilt %s supplier summaries", len(summaries))
+    return len(summaries)
+
+
+async def get_supplier_analytics(component: Optional[str] = None, country: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Read the precomputed summaries matching the filters with one indexed query, plus totals.
+    """
+    query = {}
+    if component:
+        query["component_key"] = component_key(component)
+    if country:
+        query["country"] = country
+    summaries = await SupplierSummary.find(query).to_list()
+
+    totals = {"supplier_count": 0, "by_country": {}, "by_component": {}}
+    for summary in summaries:
+        totals["supplier_count"] += summary.supplier_count
+        totals["by_country"][summary.country] = totals["by_country"].get(summary.country, 0) + summary.supplier_count
+        totals["by_component"][summary.component_type] = totals["by_component"].get(summary.component_type, 0) + summary.supplier_count
+    return {"totals": totals, "summaries": summaries}
+
+
+def main():
+    from app.db import init_db
+    from app.logging_config import configure_logging
+
+    configure_logging(service="analytics")
+
+    async def _run():
+        await init_db()
+        return await rebuild_supplier_summaries()
+
+    asyncio.run(_run())
+
+
+if __name__ == "__main__":
+    main()
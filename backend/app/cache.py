@@ -0,0 +1,180 @@
+import asyncio
+import logging
+import time
+import urllib.parse
+import uuid
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Dict, Optional, Tuple
+
+from app.clients import get_redis_client
+from app.settings import get_settings
+
+# Configure logger
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = "suppliers"
+STATS_KEY = f"{KEY_PREFIX}:cache:stats"
+WILDCARD = "*"
+
+
+def _scope(component: Optional[str], country: Optional[str]) -> str:
+    return ":".join(urllib.parse.quote(value, safe="") if value else WILDCARD for value in (component, country))
+
+
+def _generation_key(component: Optional[str], country: Optional[str]) -> str:
+    return f"{KEY_PREFIX}:gen:{_scope(component, country)}"
+
+
+@dataclass
+class CacheStats:
+    """
+    In-process counters for the supplier listing cache.
+    """
+    hits: int = 0
+    misses: int = 0
+    errors: int = 0
+    latency_ms: Dict[str, float] = field(default_factory=lambda: {"hit": 0.0, "miss": 0.0})
+
+    def record(self, outcome: str, elapsed_ms: float):
+        if outcome == "hit":
+            self.hits += 1
+        else:
+            self.misses += 1
+        self.latency_ms[outcome] += elapsed_ms
+
+    def as_dict(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "errors": self.errors,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else None,
+            "avg_hit_latency_ms": round(self.latency_ms["hit"] / self.hits, 3) if self.hits else None,
+            "avg_miss_latency_ms": round(self.latency_ms["miss"] / self.misses, 3) if self.misses else None,
+        }
+
+
+class SupplierListingCache:
+    """
+    Redis read-through cache for serialized supplier listings.
+
+    Entries are keyed by filter, page and a per-filter generation token. Writing
+    suppliers for a (component, country) pair replaces the generations of exactly the
+    filters that can include them: (component, country), (component, *), (*, country)
+    and (*, *). Entries under old generations are never read again and expire on their own.
+    Generations are random tokens rather than counters so that an evicted generation key
+    can never make an old entry reachable again.
+    Redis errors are logged and treated as misses so listings keep working without Redis.
+    """
+
+    def __init__(self):
+        self.stats = CacheStats()
+        self._pending = set()
+
+    @property
+    def enabled(self) -> bool:
+        return get_settings().supplier_cache_enabled
+
+    async def lookup(self, component: Optional[str], country: Optional[str], variant: str) -> Tuple[Optional[str], Optional[Tuple[str, bytes, Optional[datetime]]]]:
+        """
+        Return (entry key, (etag, body, latest write)) for a listing, the cached value being None on a miss.
+        The returned key must be used to store the listing once it is loaded.
+        """
+        if not self.enabled:
+            return None, None
+        try:
+            redis = get_redis_client()
+            generation_key = _generation_key(component, country)
+            generation = await redis.get(generation_key)
+            if generation is None:
+                generation = uuid.uuid4().hex.encode()
+                if not await redis.set(generation_key, generation, nx=True):
+                    generation = await redis.get(generation_key)
+            key = f"{KEY_PREFIX}:list:{_scope(component, country)}:{generation.decode()}:{variant}"
+            cached = await redis.hmget(key, "etag", "body", "updated_at")
+        except Exception as e:
+            self.stats.errors += 1
+            logger.warning("Supplier cache lookup failed: %s", e)
+            return None, None
+        if cached[0] is None or cached[1] is None:
+            return key, None
+        updated_at = datetime.fromisoformat(cached[2].decode()) if cached[2] else None
+        return key, (cached[0].decode(), cached[1], updated_at)
+
+    async def store(self, key: Optional[str], etag: str, body: bytes, updated_at: Optional[datetime] = None):
+        if not key:
+            return
+        try:
+            redis = get_redis_client()
+            async with redis.pipeline(transaction=True) as pipe:
+                pipe.hset(key, mapping={"etag": etag, "body": body, "updated_at": updated_at.isoformat() if updated_at else ""})
+                pipe.expire(key, get_settings().supplier_cache_ttl_seconds)
+                await pipe.execute()
+        except Exception as e:
+            self.stats.errors += 1
+            logger.warning("Supplier cache store failed: %s", e)
+
+    async def invalidate(self, component: str, country: str):
+        """
+        Invalidate every cached listing that may contain suppliers for component/country.
+        """
+        try:
+            redis = get_redis_client()
+            async with redis.pipeline(transaction=True) as pipe:
+                for scope in ((component, country), (component, None), (None, country), (None, None)):
+                    pipe.set(_generation_key(*scope), uuid.uuid4().hex)
+                await pipe.execute()
+            logger.debug("Invalidated supplier listings for %s in %s", component, country)
+        except Exception as e:
+            self.stats.errors += 1
+            logger.warning("Supplier cache invalidation failed for %s in %s: %s", component, country, e)
+
+    def record(self, outcome: str, started: float):
+        """
+        Record a hit or miss with the request latency. Local counters are updated
+        immediately; the shared Redis counters are updated in the background so that
+        bookkeeping never adds to the response time.
+        """
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        self.stats.record(outcome, elapsed_ms)
+        if not self.enabled:
+            return
+        update = asyncio.get_running_loop().create_task(self._record_shared(outcome, elapsed_ms))
+        self._pending.add(update)
+        update.add_done_callback(self._pending.discard)
+
+    async def _record_shared(self, outcome: str, elapsed_ms: float):
+        try:
+            redis = get_redis_client()
+            async with redis.pipeline(transaction=False) as pipe:
+                pipe.hincrby(STATS_KEY, "hits" if outcome == "hit" else "misses", 1)
+                pipe.hincrbyfloat(STATS_KEY, f"{outcome}_latency_ms", elapsed_ms)
+                await pipe.execute()
+        except Exception as e:
+            logger.debug("Failed to record supplier cache stats: %s", e)
+
+    async def report(self) -> Dict[str, Any]:
+        """
+        Hit ratio and latency for this process and across all API processes.
+        """
+        report = {"enabled": self.enabled, "process": self.stats.as_dict(), "global": None}
+        if not self.enabled:
+            return report
+        try:
+            raw = await get_redis_client().hgetall(STATS_KEY)
+        except Exception as e:
+            logger.warning("Failed to read supplier cache stats: %s", e)
+            return report
+        values = {key.decode(): float(value) for key, value in raw.items()}
+        shared = CacheStats(
+            hits=int(values.get("hits", 0)),
+            misses=int(values.get("misses", 0)),
+            latency_ms={"hit": values.get("hit_latency_ms", 0.0), "miss": values.get("miss_latency_ms", 0.0)},
+        )
+        report["global"] = shared.as_dict()
+        report["global"].pop("errors")
+        return report
+
+
+supplier_cache = SupplierListingCache()
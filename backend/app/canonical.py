@@ -0,0 +1,338 @@
+"""
+Canonicalization of component queries, so spelling variants share one search and one
+supplier set.
+
+A component string is reduced to a canonical key: lowercased, accents and punctuation
+removed, plurals singularized, synonyms replaced by their canonical term, stopwords
+dropped and the words sorted. "AC compressor", "air-conditioner compressors" and
+"compressor (HVAC)" all become "ac compressor".
+
+Keys of past SupplierTask components are held in an in-process trigram index. An
+incoming query whose key matches a known key exactly, or closely enough, is mapped to
+the component string already used for that key. Closely enough means the same number
+of words, identical words containing digits ("100w", "6061", "220v") and every other
+word at least query_similarity_threshold trigram-similar to a distinct word of the
+known key (for typos), so different specifications never merge.
+
+Suppliers, tasks and supplier summaries also store the canonical key (component_key)
+and are filtered on it, so the data stored under every spelling of a component stays
+reachable whichever spelling a process happens to use. Keys of documents stored before
+component_key existed are filled in when the index is loaded; after changing the
+synonym table, recompute every key with --rekey. Suppliers, cache entries, popularity and
+results then line up across variants. Everything runs locally, without network calls
+beyond reading past tasks from MongoDB.
+
+To list the variant groups found in past tasks (from the backend directory):
+
+    python -m app.canonical
+    python -m app.canonical --rekey    # recompute every stored component_key
+"""
+import argparse
+import asyncio
+import json
+import logging
+import re
+import time
+import unicodedata
+from typing import Dict, List, Optional, Set, Tuple
+
+from app.settings import get_settings
+
+# Configure logger
+logger = logging.getLogger(__name__)
+
+# Canonical term -> variants, extended or overridden by QUERY_SYNONYMS_FILE (same JSON shape)
+DEFAULT_SYNONYMS = {
+    "ac": ["air conditioner", "air conditioning", "air con", "aircon", "a c", "hvac"],
+    "aluminum": ["aluminium"],
+    "pcb": ["printed circuit board", "circuit board"],
+    "stainless steel": ["inox", "ss steel"],
+    "fastener": ["fixing"],
+    "led": ["light emitting diode"],
+    "motor": ["electric motor"],
+}
+
+STOPWORDS = {"a", "an", "and", "for", "in", "of", "the", "to", "with"}
+
+
+def _fold(text: str) -> str:
+    """
+    Lowercase, strip accents and turn punctuation into spaces.
+    """
+    text = unicodedata.normalize("NFKD", text)
+    text = "".join(char for char in text if not unicodedata.combining(char)).lower()
+    return " ".join(re.sub(r"[^\w]+|_", " ", text).split())
+
+
+def _singular(word: str) -> str:
+    if len(word) <= 3 or not word.endswith("s") or word.endswith(("ss", "us", "is")):
+        return word
+    if word.endswith("ies"):
+        return word[:-3] + "y"
+    if word.endswith(("xes", "ches", "shes", "sses")):
+        return word[:-2]
+    return word[:-1]
+
+
+def _trigrams(key: str) -> Set[str]:
+    padded = f"  {key} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def _has_digit(word: str) -> bool:
+    return any(char.isdigit() for char in word)
+
+
+def _similarity(a: str, b: str) -> float:
+    if a == b:
+        return 1.0
+    trigrams_a, trigrams_b = _trigrams(a), _trigrams(b)
+    return len(trigrams_a & trigrams_b) / len(trigrams_a | trigrams_b)
+
+
+def _match_terms(terms: List[str], candidate_terms: List[str], threshold: float) -> Optional[float]:
+    """
+    Pair each word with a distinct candidate word at least threshold similar (for typos).
+    Returns the mean similarity of the pairs, or None if some word has no pair.
+    """
+    remaining = list(candidate_terms)
+    scores = []
+    for term in sorted(terms, key=lambda term: term not in remaining):
+        score, pair = max(((_similarity(term, other), other) for other in remaining), default=(0.0, None))
+        if score < threshold:
+            return None
+        remaining.remove(pair)
+        scores.append(score)
+    return sum(scores) / len(scores) if scores else 1.0
+
+
+def load_synonyms(path: Optional[str] = None) -> Dict[str, List[str]]:
+    """
+    The default synonym table, updated with the table in a JSON file if one is configured.
+    """
+    synonyms = {canonical: list(variants) for canonical, variants in DEFAULT_SYNONYMS.items()}
+    if path:
+        with open(path) as synonyms_file:
+            synonyms.update(json.load(synonyms_file))
+    return synonyms
+
+
+class QueryCanonicalizer:
+    """
+    Maps component strings to canonical keys and to the component string already in
+    use for that key. The index of past components is loaded lazily and reloaded every
+    query_index_refresh_seconds; components seen in between are added as they come.
+    """
+
+    def __init__(self, synonyms: Optional[Dict[str, List[str]]] = None, similarity_threshold: Optional[float] = None):
+        self._synonyms = synonyms
+        self._similarity_threshold = similarity_threshold
+        self._patterns: Optional[List[Tuple[re.Pattern, str]]] = None
+        self._components: Dict[str, str] = {}
+        self._trigram_index: Dict[str, Set[str]] = {}
+        self._loaded_at: Optional[float] = None
+        self._lock: Optional[asyncio.Lock] = None
+
+    def _synonym_patterns(self) -> List[Tuple[re.Pattern, str]]:
+        if self._patterns is None:
+            synonyms = self._synonyms if self._synonyms is not None else load_synonyms(get_settings().query_synonyms_file)
+            phrases = []
+            for canonical, variants in synonyms.items():
+                canonical = " ".join(_singular(word) for word in _fold(canonical).split())
+                for variant in variants:
+                    variant = " ".join(_singular(word) for word in _fold(variant).split())
+                    if variant and variant != canonical:
+                        phrases.append((variant, canonical))
+            # Longest variants first, so "air conditioning" wins over "air"
+            phrases.sort(key=lambda phrase: -len(phrase[0]))
+            self._patterns = [(re.compile(rf"\b{re.escape(variant)}\b"), canonical) for variant, canonical in phrases]
+        return self._patterns
+
+    def canonical_key(self, component: str) -> str:
+        """
+        Normalized, synonym-mapped, order-independent key for a component string.
+        """
+        text = " ".join(_singular(word) for word in _fold(component).split())
+        for pattern, canonical in self._synonym_patterns():
+            text = pattern.sub(canonical, text)
+        words = {word for word in text.split() if word not in STOPWORDS}
+        return " ".join(sorted(words)) or text
+
+    def register(self, component: str):
+        """
+        Add a component string to the index unless its key already has one.
+        """
+        key = self.canonical_key(component)
+        if key in self._components:
+            return
+        self._components[key] = component
+        for trigram in _trigrams(key):
+            self._trigram_index.setdefault(trigram, set()).add(key)
+
+    def _closest_key(self, key: str) -> Optional[str]:
+        if key in self._components:
+            return key
+        words = key.split()
+        specs = {word for word in words if _has_digit(word)}
+        terms = [word for word in words if not _has_digit(word)]
+        threshold = self._similarity_threshold if self._similarity_threshold is not None else get_settings().query_similarity_threshold
+        candidates = set()
+        for trigram in _trigrams(key):
+            candidates.update(self._trigram_index.get(trigram, ()))
+        best, best_score = None, 0.0
+        for candidate in candidates:
+            candidate_words = candidate.split()
+            # Sizes, ratings and grades ("100w", "6061", "10uf") must be identical
+            if len(candidate_words) != len(words) or {word for word in candidate_words if _has_digit(word)} != specs:
+                continue
+            score = _match_terms(terms, [word for word in candidate_words if not _has_digit(word)], threshold)
+            if score is not None and score > best_score:
+                best, best_score = candidate, score
+        return best
+
+    def match(self, component: str) -> Optional[str]:
+        """
+        The component string in use for this component's key or a close one, if any.
+        """
+        key = self._closest_key(self.canonical_key(component))
+        return self._components[key] if key else None
+
+    async def load(self):
+        """
+        Rebuild the index from past tasks. For each key the most requested spelling is used.
+        """
+        from app.models.task import SupplierTask
+
+        rows = await SupplierTask.aggregate([
+            {"$group": {"_id": "$component", "requests": {"$sum": 1}, "first": {"$min": "$started_at"}}},
+            {"$sort": {"requests": -1, "first": 1}},
+        ]).to_list()
+        self._components = {}
+        self._trigram_index = {}
+        for row in rows:
+            if row["_id"]:
+                self.register(row["_id"])
+        self._loaded_at = time.monotonic()
+        logger.debug("Loaded %s canonical components from %s task components", len(self._components), len(rows))
+        try:
+            await self.backfill_component_keys()
+        except Exception as e:
+            logger.warning("Failed to backfill component keys: %s", e)
+
+    async def backfill_component_keys(self, rekey: bool = False) -> int:
+        """
+        Set component_key on suppliers and tasks stored without one, or on all of them
+        with rekey. Supplier summaries are rebuilt when supplier keys changed.
+        Returns the number of documents updated.
+        """
+        from app.analytics import rebuild_supplier_summaries
+        from app.models.supplier import Supplier
+        from app.models.task import SupplierTask
+
+        updated = {}
+        for model, field in ((Supplier, "component_type"), (SupplierTask, "component")):
+            collection = model.get_motor_collection()
+            updated[model] = 0
+            for component in await collection.distinct(field, {} if rekey else {"component_key": None}):
+                key = self.canonical_key(component)
+                result = await collection.update_many(
+                    {field: component, "component_key": {"$ne": key}},
+                    {"$set": {"component_key": key}},
+                )
+                updated[model] += result.modified_count
+        if updated[Supplier]:
+            await rebuild_supplier_summaries()
+        if any(updated.values()):
+            logger.info("Set component keys on %s suppliers and %s tasks", updated[Supplier], updated[SupplierTask])
+        return sum(updated.values())
+
+    async def _ensure_loaded(self):
+        refresh_seconds = get_settings().query_index_refresh_seconds
+        if self._loaded_at is not None and time.monotonic() - self._loaded_at < refresh_seconds:
+            return
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            if self._loaded_at is None or time.monotonic() - self._loaded_at >= refresh_seconds:
+                await self.load()
+
+    async def canonicalize(self, component: str) -> str:
+        """
+        Component string to search and store under: the known spelling for the query's
+        key when there is one, otherwise the query itself (which then becomes known).
+        """
+        component = " ".join(component.split())
+        try:
+            await self._ensure_loaded()
+        except Exception as e:
+            logger.warning("Query canonicalization index unavailable: %s", e)
+            return component
+        known = self.match(component)
+        if known is None:
+            self.register(component)
+            return component
+        if known != component:
+            logger.info("Canonicalized component '%s' to '%s'", component, known)
+        return known
+
+    async def lookup(self, component: Optional[str]) -> Optional[str]:
+        """
+        Like canonicalize, for filters: unknown components are returned unchanged and not registered.
+        """
+        if not component:
+            return component
+        try:
+            await self._ensure_loaded()
+        except Exception as e:
+            logger.warning("Query canonicalization index unavailable: %s", e)
+            return component
+        return self.match(component) or component
+
+    async def variant_groups(self) -> Dict[str, List[str]]:
+        """
+        Past task components grouped by canonical key, for keys with more than one spelling.
+        """
+        from app.models.task import SupplierTask
+
+        groups = {}
+        for component in await SupplierTask.distinct("component"):
+            groups.setdefault(self.canonical_key(component), []).append(component)
+        return {key: sorted(components) for key, components in groups.items() if len(components) > 1}
+
+
+query_canonicalizer = QueryCanonicalizer()
+
+
+def component_key(component: str) -> str:
+    """
+    Key under which suppliers, tasks and summaries for a component are stored and filtered.
+    """
+    return query_canonicalizer.canonical_key(component)
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="List spelling variants of past task components, or recompute stored component keys.")
+    parser.add_argument("--rekey", action="store_true", help="Recompute component_key on every supplier and task (after changing synonyms)")
+    args = parser.parse_args(argv)
+
+    from app.db import init_db
+    from app.logging_config import configure_logging
+
+    configure_logging(service="canonical")
+
+    async def _run():
+        await init_db()
+        if args.rekey:
+            return await query_canonicalizer.backfill_component_keys(rekey=True)
+        return await query_canonicalizer.variant_groups()
+
+    result = asyncio.run(_run())
+    if args.rekey:
+        print(f"Updated {result} documents")
+        return
+    for key, components in result.items():
+        print(f"{key}: {' | '.join(components)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+import asyncio
+import logging
+from functools import lru_cache
+
+from app.settings import get_settings
+
+# Configure logger
+logger = logging.getLogger(__name__)
+
+# Async clients (Motor, redis.asyncio) are bound to the event loop they were first used on,
+# so keep one of each per loop
+_loop_clients = {}
+
+
+@lru_cache(maxsize=None)
+def get_anthropic_client():
+    """
+    Return the process-wide Anthropic client, constructing it on first use.
+    The SDK is imported here so that importing the API routes stays cheap.
+    """
+    settings = get_settings()
+    if not settings.anthropic_api_key:
+        raise ValueError("ANTHROPIC_API_KEY is missing in the environment")
+
+    from anthropic import Anthropic
+    client = Anthropic(api_key=settings.anthropic_api_key)
+    logger.debug("Anthropic client initialized")
+    return client
+
+
+@lru_cache(maxsize=None)
+def get_celery_app():
+    """
+    Return the Celery application used both by the worker and, as a producer, by the API.
+    """
+    from celery import Celery
+    settings = get_settings()
+    celery_app = Celery(
+        "procurement_assistant",
+        broker=settings.redis_url,
+        backend=settings.redis_url
+    )
+    logger.debug("Celery app created")
+    return celery_app
+
+
+def _get_loop_client(name: str, factory):
+    loop = asyncio.get_running_loop()
+    client = _loop_clients.get((loop, name))
+    if client is None:
+        # Forget clients whose loop has gone away (e.g. a previous asyncio.run)
+        for stale in [key for key in _loop_clients if key[0].is_closed()]:
+            _loop_clients.pop(stale)
+        client = factory()
+        _loop_clients[(loop, name)] = client
+    return client
+
+
+def get_mongo_client():
+    """
+    Return the Motor client for the running event loop, creating it on first use.
+    """
+    import motor.motor_asyncio
+
+    def factory():
+        settings = get_settings()
+        logger.info("Connecting to MongoDB with URI: %s", settings.sanitized_mongo_uri)
+        return motor.motor_asyncio.AsyncIOMotorClient(settings.mongo_uri)
+
+    return _get_loop_client("mongo", factory)
+
+
+def get_redis_client():
+    """
+    Return the asyncio Redis client for the running event loop, creating it on first use.
+    """
+    import redis.asyncio
+
+    def factory():
+        settings = get_settings()
+        return redis.asyncio.Redis.from_url(
+            settings.redis_url,
+            socket_timeout=settings.redis_socket_timeout,
+            socket_connect_timeout=settings.redis_socket_timeout,
+        )
+
+    return _get_loop_client("redis", factory)
@@ -1,64 +1,54 @@
-import motor.motor_asyncio
+import asyncio
+import weakref
 from beanie import init_beanie
-from os import getenv
-import urllib.parse
-from dotenv import load_dotenv
 import logging
 
+from app.clients import get_mongo_client
+from app.settings import get_settings
 from app.models.supplier import Supplier
 from app.models.search_result import SearchResult
 from app.models.task import SupplierTask
+from app.models.supplier_summary import SupplierSummary
+from app.models.idempotency import IdempotencyRecord
 
 # Configure logger
 logger = logging.getLogger(__name__)
 
-# Load environment variables
-load_dotenv()
-logger.debug("Environment variables loaded in db.py")
+# Event loops on which Beanie has already been initialized
+_initialized_loops = weakref.WeakSet()
+
 
 async def init_db():
-    """Initialize the database connection."""
+    """
+    Initialize the database connection.
+    Safe to call repeatedly: Beanie is only initialized once per event loop.
+    """
+    loop = asyncio.get_running_loop()
+    if loop in _initialized_loops:
+        logger.debug("Database already initialized for this event loop")
+        return
+
     logger.info("Starting database initialization")
-    
-    # Get MongoDB connection details from environment variables
-    mongodb_user = getenv("MONGODB_USER", "admin")
-    mongodb_password = getenv("MONGODB_PASSWORD", "password")
-    mongodb_host = getenv("MONGODB_HOST", "localhost")
-    mongodb_port = getenv("MONGODB_PORT", "27017")
-    db_name = getenv("MONGODB_DB_NAME", "procurement_assistant")
-    
-    logger.debug(f"MongoDB connection parameters: user={mongodb_user}, host={mongodb_host}, port={mongodb_port}, db={db_name}")
-    
-    # URL encode the username and password to handle special characters
-    encoded_username = urllib.parse.quote_plus(mongodb_user)
-    encoded_password = urllib.parse.quote_plus(mongodb_password)
-    logger.debug("Username and password URL encoded")
-    
-    # Construct the connection URI with authentication and authSource
-    # The authSource=admin is critical because MongoDB stores user credentials in the admin database by default
-    mongo_uri = f"mongodb://{encoded_username}:{encoded_password}@{mongodb_host}:{mongodb_port}/{db_name}?authSource=admin"
-    
-    # Log a sanitized version of the URI (without the actual password)
-    sanitized_uri = f"mongodb://{encoded_username}:***@{mongodb_host}:{mongodb_port}/{db_name}?authSource=admin"
-    logger.info(f"Connecting to MongoDB with URI: {sanitized_uri}")
-    
+    settings = get_settings()
+    logger.debug("MongoDB connection parameters: user=%s, host=%s, port=%s, db=%s", settings.mongodb_user, settings.mongodb_host, settings.mongodb_port, settings.mongodb_db_name)
+
     try:
-        # Create a MongoDB client with authentication
-        logger.debug("Creating AsyncIOMotorClient")
-        client = motor.motor_asyncio.AsyncIOMotorClient(mongo_uri)
-        
+        # Create (or reuse) the MongoDB client for this loop
+        client = get_mongo_client()
+
         # Test the connection
         logger.debug("Testing connection with ping command")
         await client.admin.command('ping')
         logger.info("Successfully connected to MongoDB")
-        
+
         # Initialize Beanie with all document models
-        logger.debug(f"Initializing Beanie with document models: {[Supplier.__name__, SearchResult.__name__, SupplierTask.__name__]}")
-        await init_beanie(database=client[db_name], document_models=[Supplier, SearchResult, SupplierTask])
+        logger.debug("Initializing Beanie with document models: %s", [Supplier.__name__, SearchResult.__name__, SupplierTask.__name__, SupplierSummary.__name__, IdempotencyRecord.__name__])
+        await init_beanie(database=client[settings.mongodb_db_name], document_models=[Supplier, SearchResult, SupplierTask, SupplierSummary, IdempotencyRecord])
+        _initialized_loops.add(loop)
         logger.info("Beanie initialization complete")
-        
+
     except Exception as e:
-        logger.error(f"Error connecting to MongoDB: {str(e)}", exc_info=True)
-        logger.debug("Connection string used (sanitized): " + sanitized_uri)
+        logger.error("Error connecting to MongoDB: %s", e, exc_info=True)
+        logger.debug("Connection string used (sanitized): %s", settings.sanitized_mongo_uri)
         logger.debug("Check if MongoDB is running and credentials are correct")
-        raise e
\ No newline at end of file
+        raise e
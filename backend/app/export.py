@@ -0,0 +1,264 @@
+"""
+Streaming export of the supplier collection as NDJSON, CSV or Parquet.
+
+Documents are read from a MongoDB cursor in batches and each batch is serialized and
+yielded before the next one is fetched, so memory use stays constant regardless of
+the size of the export.
+
+Command line usage (from the backend directory):
+
+    python -m app.export --format csv --output suppliers.csv --country Germany
+"""
+import argparse
+import asyncio
+import csv
+import io
+import logging
+import sys
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, List, Optional, Sequence
+
+import orjson
+
+from app.canonical import component_key
+from app.models.supplier import Supplier
+
+# Configure logger
+logger = logging.getLogger(__name__)
+
+EXPORT_FORMATS = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+# Exported by default; raw_ai_source is large and only included when asked for explicitly
+DEFAULT_EXPORT_FIELDS = (
+    "_id",
+    "name",
+    "website",
+    "location",
+    "product",
+    "component_type",
+    "country",
+    "lead_time_days",
+    "min_order_qty",
+    "certifications",
+    "summary",
+    "created_at",
+    "updated_at",
+)
+EXPORTABLE_FIELDS = DEFAULT_EXPORT_FIELDS + ("raw_ai_source",)
+
+DEFAULT_BATCH_SIZE = 1000
+
+
+class ExportError(ValueError):
+    """Raised for invalid export parameters."""
+
+
+def resolve_fields(fields: Optional[Sequence[str]]) -> List[str]:
+    """
+    Validate the requested fields, defaulting to DEFAULT_EXPORT_FIELDS.
+    """
+    if not fields:
+        return list(DEFAULT_EXPORT_FIELDS)
+    unknown = [field for field in fields if field not in EXPORTABLE_FIELDS]
+    if unknown:
+        raise ExportError(f"Unknown export fields: {', '.join(unknown)}")
+    return list(fields)
+
+
+def check_export_format(export_format: str):
+    """
+    Validate the export format up front, before any response has been started.
+    """
+    if export_format not in EXPORT_FORMATS:
+        raise ExportError(f"Unsupported export format: {export_format}")
+    if export_format == "parquet":
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            raise ExportError("Parquet export requires pyarrow to be installed")
+
+
+def build_export_query(component: Optional[str] = None, country: Optional[str] = None) -> Dict[str, Any]:
+    query = {}
+    if component:
+        # Suppliers stored under any spelling of the component
+        query["component_key"] = component_key(component)
+    if country:
+        query["country"] = country
+    return query
+
+
+async def iter_supplier_batches(query: Dict[str, Any], fields: List[str], batch_size: int = DEFAULT_BATCH_SIZE) -> AsyncIterator[List[Dict[str, Any]]]:
+    """
+    Yield lists of projected supplier documents straight from a MongoDB cursor.
+    """
+    projection = {field: 1 for field in fields}
+    if "_id" not in fields:
+        projection["_id"] = 0
+    cursor = Supplier.get_motor_collection().find(query, projection=projection, batch_size=batch_size)
+    batch = []
+    async for document in cursor:
+        batch.append(document)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _row(document: Dict[str, Any], fields: List[str]) -> Dict[str, Any]:
+    row = {field: document.get(field) for field in fields}
+    if "_id" in row:
+        row["_id"] = str(row["_id"])
+    if "updated_at" in row and row["updated_at"] is None:
+        row["updated_at"] = document.get("created_at")
+    return row
+
+
+def _ndjson_chunk(batch: List[Dict[str, Any]], fields: List[str]) -> bytes:
+    return b"".join(orjson.dumps(_row(document, fields), default=str) + b"\n" for document in batch)
+
+
+def _csv_value(value: Any) -> Any:
+    if value is None:
+        return ""
+    if isinstance(value, list):
+        return "; ".join(value)
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+def _csv_chunk(batch: List[Dict[str, Any]], fields: List[str], header: bool) -> bytes:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if header:
+        writer.writerow(fields)
+    for document in batch:
+        row = _row(document, fields)
+        writer.writerow([_csv_value(row[field]) for field in fields])
+    return buffer.getvalue().encode()
+
+
+class _ChunkSink(io.RawIOBase):
+    """
+    Write-only file object that hands written bytes back to the caller chunk by chunk.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._chunks = []
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self._chunks.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def _parquet_schema(fields: List[str]):
+    import pyarrow as pa
+
+    types = {
+        "lead_time_days": pa.int64(),
+        "min_order_qty": pa.int64(),
+        "certifications": pa.list_(pa.string()),
+        "created_at": pa.timestamp("ms"),
+        "updated_at": pa.timestamp("ms"),
+    }
+    return pa.schema([(field, types.get(field, pa.string())) for field in fields])
+
+
+async def stream_suppliers(export_format: str, query: Dict[str, Any], fields: List[str], batch_size: int = DEFAULT_BATCH_SIZE) -> AsyncIterator[bytes]:
+    """
+    Yield the export as a sequence of byte chunks, one per cursor batch.
+    """
+    check_export_format(export_format)
+
+    if export_format == "parquet":
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        schema = _parquet_schema(fields)
+        sink = _ChunkSink()
+        writer = pq.ParquetWriter(sink, schema, compression="zstd")
+        # Each cursor batch becomes one row group, flushed to the client immediately
+        async for batch in iter_supplier_batches(query, fields, batch_size):
+            rows = [_row(document, fields) for document in batch]
+            writer.write_table(pa.Table.from_pylist(rows, schema=schema))
+            yield sink.drain()
+        writer.close()
+        yield sink.drain()
+        return
+
+    header = True
+    async for batch in iter_supplier_batches(query, fields, batch_size):
+        if export_format == "ndjson":
+            yield _ndjson_chunk(batch, fields)
+        else:
+            yield _csv_chunk(batch, fields, header)
+            header = False
+    if export_format == "csv" and header:
+        # Empty export: still emit the header row
+        yield _csv_chunk([], fields, True)
+
+
+async def export_to_file(export_format: str, output, query: Dict[str, Any], fields: List[str], batch_size: int = DEFAULT_BATCH_SIZE) -> int:
+    """
+    Write an export to a binary file object. Returns the number of bytes written.
+    """
+    written = 0
+    async for chunk in stream_suppliers(export_format, query, fields, batch_size):
+        output.write(chunk)
+        written += len(chunk)
+    return written
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Export suppliers as NDJSON, CSV or Parquet.")
+    parser.add_argument("--format", choices=sorted(EXPORT_FORMATS), default="ndjson")
+    parser.add_argument("--output", default="-", help="Output file (default: stdout)")
+    parser.add_argument("--component", help="Component type to filter by")
+    parser.add_argument("--country", help="Country to filter by")
+    parser.add_argument("--fields", help=f"Comma separated fields (available: {', '.join(EXPORTABLE_FIELDS)})")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    args = parser.parse_args(argv)
+
+    from app.db import init_db
+    from app.logging_config import configure_logging
+
+    # Logs go to stderr so that stdout can carry the export
+    configure_logging(service="export", stream=sys.stderr)
+    fields = resolve_fields(args.fields.split(",") if args.fields else None)
+    check_export_format(args.format)
+    query = build_export_query(args.component, args.country)
+
+    async def _run():
+        await init_db()
+        if args.output == "-":
+            return await export_to_file(args.format, sys.stdout.buffer, query, fields, args.batch_size)
+        with open(args.output, "wb") as output:
+            return await export_to_file(args.format, output, query, fields, args.batch_size)
+
+    written = asyncio.run(_run())
+    logger.info("Exported %s bytes of %s to %s", written, args.format, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+import hashlib
+import logging
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional, Tuple
+
+import orjson
+from beanie import PydanticObjectId
+from pymongo.errors import DuplicateKeyError
+
+from app.models.idempotency import IdempotencyRecord
+from app.models.task import SupplierTask
+from app.settings import get_settings
+
+# Configure logger
+logger = logging.getLogger(__name__)
+
+
+class IdempotencyError(Exception):
+    """
+    Raised when an Idempotency-Key cannot be honoured: reused with a different request
+    (422), or its first submission is still being created (409).
+    """
+
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+def request_fingerprint(payload: Dict[str, Any]) -> str:
+    return hashlib.sha1(orjson.dumps(payload, option=orjson.OPT_SORT_KEYS)).hexdigest()
+
+
+async def claim_idempotency_key(key: str, payload: Dict[str, Any]) -> Tuple[PydanticObjectId, Optional[SupplierTask]]:
+    """
+    Reserve a task id for an Idempotency-Key.
+
+    Returns (task id, None) for a new key: the caller must create the task with that id.
+    Returns (task id, task) when the key was already used for the same request.
+    The unique index on the key makes concurrent submissions race safely.
+    """
+    fingerprint = request_fingerprint(payload)
+    record = IdempotencyRecord(
+        key=key,
+        fingerprint=fingerprint,
+        task_id=PydanticObjectId(),
+        expires_at=datetime.utcnow() + timedelta(hours=get_settings().idempotency_key_ttl_hours),
+    )
+    try:
+        await record.insert()
+        return record.task_id, None
+    except DuplicateKeyError:
+        pass
+
+    existing = await IdempotencyRecord.find_one({"key": key})
+    if existing is None:
+        # Expired between the insert and the lookup
+        raise IdempotencyError(409, "Idempotency-Key is being released, retry the request")
+    if existing.fingerprint != fingerprint:
+        raise IdempotencyError(422, "Idempotency-Key was already used with a different request")
+    task = await SupplierTask.get(existing.task_id)
+    if task is None:
+        raise IdempotencyError(409, "The request with this Idempotency-Key is still being processed, retry shortly")
+    logger.info("Idempotency-Key replayed, returning task %s", task.id)
+    return existing.task_id, task
+
+
+async def release_idempotency_key(key: str):
+    """
+    Forget a key whose task could not be created, so the client can retry with it.
+    """
+    await IdempotencyRecord.find({"key": key}).delete()
@@ -0,0 +1,203 @@
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from typing import Optional, TextIO
+
+# Correlation ids attached to every record emitted while they are set
+request_id_var: ContextVar[Optional[str]] = ContextVar("request_id", default=None)
+task_id_var: ContextVar[Optional[str]] = ContextVar("task_id", default=None)
+
+# Per-environment defaults, overridable with LOG_LEVEL / LOG_SAMPLE_RATE / LOG_FORMAT.
+# Sampling only thins records below INFO, so it only matters where the level is DEBUG.
+ENVIRONMENT_DEFAULTS = {
+    "development": {"level": "DEBUG", "sample_rate": 1.0, "format": "text"},
+    "staging": {"level": "DEBUG", "sample_rate": 0.25, "format": "json"},
+    "production": {"level": "INFO", "sample_rate": 1.0, "format": "json"},
+}
+
+# Argument types that cannot change between the logging call and the listener formatting it
+_IMMUTABLE_ARG_TYPES = (str, int, float, bool, bytes, type(None), datetime)
+
+_listener: Optional[logging.handlers.QueueListener] = None
+_queue_handler: Optional["ContextQueueHandler"] = None
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    Render a log record as a single line of JSON.
+    """
+
+    def __init__(self, service: str):
+        super().__init__()
+        self.service = service
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(),
+            "level": record.levelname,
+            "service": self.service,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        request_id = getattr(record, "request_id", None)
+        if request_id:
+            entry["request_id"] = request_id
+        task_id = getattr(record, "task_id", None)
+        if task_id:
+            entry["task_id"] = task_id
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exc_info"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    """
+    Human readable formatter for local development that still shows correlation ids.
+    """
+
+    def __init__(self):
+        super().__init__('%(asctime)s - %(name)s - %(levelname)s - [%(correlation)s] %(message)s')
+
+    def format(self, record: logging.LogRecord) -> str:
+        record.correlation = getattr(record, "request_id", None) or getattr(record, "task_id", None) or "-"
+        return super().format(record)
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Keep only a fraction of records below INFO. Warnings and errors are never sampled out.
+    """
+
+    def __init__(self, sample_rate: float):
+        super().__init__()
+        self.sample_rate = sample_rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.INFO or self.sample_rate >= 1.0:
+            return True
+        return random.random() < self.sample_rate
+
+
+class ContextQueueHandler(logging.handlers.QueueHandler):
+    """
+    Queue handler that captures correlation ids on the calling thread and leaves
+    formatting and file/stream I/O to the listener thread.
+
+    The queue is bounded; when it is full records are dropped instead of blocking
+    the request or task that emitted them.
+    """
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Formatting is left to the listener thread unless an argument is mutable (a dict
+        # or list that may change before the listener gets to it); then only the %-style
+        # args are merged here. The record itself is enqueued, not a copy: the merged
+        # message is the same for any other handler.
+        args = record.args.values() if isinstance(record.args, dict) else record.args or ()
+        if not all(isinstance(arg, _IMMUTABLE_ARG_TYPES) for arg in args):
+            record.msg = record.getMessage()
+            record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        record.request_id = request_id_var.get()
+        record.task_id = task_id_var.get()
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def configure_logging(service: str, log_file: Optional[str] = None, stream: Optional[TextIO] = None) -> logging.handlers.QueueListener:
+    """
+    Configure the root logger to push records onto an in-memory queue that is drained
+    by a background listener thread writing to stream (stdout by default) and,
+    optionally, a log file.
+
+    Level, sampling and output format are picked per environment (APP_ENV) and can be
+    overridden with LOG_LEVEL, LOG_SAMPLE_RATE and LOG_FORMAT. Calling this more than
+    once is a no-op.
+    """
+    global _listener, _queue_handler
+    if _listener is not None:
+        return _listener
+
+    environment = os.getenv("APP_ENV", "development").lower()
+    defaults = ENVIRONMENT_DEFAULTS.get(environment, ENVIRONMENT_DEFAULTS["development"])
+    level = os.getenv("LOG_LEVEL", defaults["level"]).upper()
+    sample_rate = float(os.getenv("LOG_SAMPLE_RATE", defaults["sample_rate"]))
+    log_format = os.getenv("LOG_FORMAT", defaults["format"]).lower()
+    queue_size = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+
+    formatter = JsonFormatter(service) if log_format == "json" else TextFormatter()
+    handlers = [logging.StreamHandler(stream or sys.stdout)]
+    if log_file:
+        handlers.append(logging.FileHandler(log_file))
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    log_queue = queue.Queue(maxsize=queue_size)
+    queue_handler = ContextQueueHandler(log_queue)
+    queue_handler.addFilter(SamplingFilter(sample_rate))
+
+    root = logging.getLogger()
+    for existing in list(root.handlers):
+        root.removeHandler(existing)
+    root.addHandler(queue_handler)
+    root.setLevel(level)
+    _queue_handler = queue_handler
+
+    _listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+    atexit.register(shutdown_logging)
+
+    logging.getLogger(__name__).info(
+        "Logging configured: service=%s env=%s level=%s sample_rate=%s format=%s",
+        service, environment, level, sample_rate, log_format
+    )
+    return _listener
+
+
+def shutdown_logging() -> None:
+    """
+    Flush queued records and stop the listener thread.
+    """
+    global _listener, _queue_handler
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+        _queue_handler = None
+
+
+def _restart_after_fork() -> None:
+    """
+    Threads do not survive fork, so a child process (a Celery prefork worker, for
+    instance) gets its own queue and listener thread; otherwise its records would pile
+    up on a queue nothing reads. Records the parent had queued are the parent's to write.
+    """
+    global _listener
+    if _listener is None or _queue_handler is None:
+        return
+    log_queue = queue.Queue(maxsize=_queue_handler.queue.maxsize)
+    _queue_handler.queue = log_queue
+    _queue_handler.dropped = 0
+    _listener = logging.handlers.QueueListener(log_queue, *_listener.handlers, respect_handler_level=True)
+    _listener.start()
+
+
+os.register_at_fork(after_in_child=_restart_after_fork)
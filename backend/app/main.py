@@ -1,28 +1,21 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from dotenv import load_dotenv
-import uvicorn
+from fastapi.middleware.gzip import GZipMiddleware
 import os
 import logging
-import sys
+import uuid
 
+from app.settings import get_settings
+from app.logging_config import configure_logging, request_id_var
 from app.db import init_db
 from app.routes.discovery import router as discovery_router
 
-# Configure logging
-logging.basicConfig(
-    level=logging.DEBUG,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler("app.log"),
-        logging.StreamHandler(sys.stdout)
-    ]
-)
-logger = logging.getLogger(__name__)
+# Load environment variables (and .env) once, before anything reads configuration
+get_settings()
 
-# Load environment variables
-load_dotenv()
-logger.info("Environment variables loaded")
+# Configure logging: records are queued and written by a background listener thread
+configure_logging(service="api", log_file="app.log")
+logger = logging.getLogger(__name__)
 
 # Create FastAPI app
 app = FastAPI(
@@ -42,6 +35,27 @@ app.add_middleware(
 )
 logger.info("CORS middleware configured")
 
+@app.middleware("http")
+async def request_context(request: Request, call_next):
+    """Tag every log record emitted while handling a request with its request id."""
+    request_id = request.headers.get("X-Request-ID") or uuid.uuid4().hex
+    token = request_id_var.set(request_id)
+    try:
+        response = await call_next(request)
+    finally:
+        request_id_var.reset(token)
+    response.headers["X-Request-ID"] = request_id
+    return response
+
+# Compress large responses (supplier listings); prefer brotli when it's installed
+try:
+    from brotli_asgi import BrotliMiddleware
+    app.add_middleware(BrotliMiddleware, minimum_size=1024, gzip_fallback=True)
+    logger.info("Brotli/gzip compression middleware configured")
+except ImportError:
+    app.add_middleware(GZipMiddleware, minimum_size=1024)
+    logger.info("Gzip compression middleware configured")
+
 # Include routers
 app.include_router(discovery_router)
 logger.info("Routes registered")
@@ -54,7 +68,7 @@ async def startup_db_client():
         await init_db()
         logger.info("Database initialization complete")
     except Exception as e:
-        logger.critical(f"Failed to initialize database: {str(e)}", exc_info=True)
+        logger.critical("Failed to initialize database: %s", e, exc_info=True)
         raise
 
 @app.get("/", tags=["Health"])
@@ -64,5 +78,6 @@ async def root():
     return {"status": "ok", "message": "AI Procurement Assistant API is running"}
 
 if __name__ == "__main__":
+    import uvicorn
     logger.info("Starting application server")
     uvicorn.run("app.main:app", host="0.0.0.0", port=8000, reload=True)
\ No newline at end of file
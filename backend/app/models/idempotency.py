@@ -0,0 +1,22 @@
+from datetime import datetime
+from beanie import Document, PydanticObjectId
+from pydantic import Field
+from pymongo import ASCENDING, IndexModel
+
+
+class IdempotencyRecord(Document):
+    """
+    Task created for an Idempotency-Key, so repeated submissions return the same task.
+    """
+    key: str = Field(..., description="Client supplied Idempotency-Key header")
+    fingerprint: str = Field(..., description="Hash of the request body the key was first used with")
+    task_id: PydanticObjectId = Field(..., description="Task created for the first submission")
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    expires_at: datetime = Field(..., description="When MongoDB deletes the record and the key can be reused (UTC)")
+
+    class Settings:
+        name = "idempotency_keys"
+        indexes = [
+            IndexModel([("key", ASCENDING)], unique=True),
+            IndexModel([("expires_at", ASCENDING)], expireAfterSeconds=0),
+        ]
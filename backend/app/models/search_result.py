@@ -1,5 +1,5 @@
 from datetime import datetime
-from typing import Optional
+from typing import Any, Dict, List, Optional
 from beanie import Document
 from pydantic import Field
 
@@ -12,6 +12,15 @@ class SearchResult(Document):
     raw_ai_response: str = Field(..., description="Raw AI response in JSON format")
     search_date: datetime = Field(default_factory=datetime.now)
     is_processed: bool = Field(default=False, description="Whether this search has been processed into suppliers")
+    is_incremental: bool = Field(default=False, description="Whether this was a delta search against already known suppliers")
+    known_suppliers: List[str] = Field(default_factory=list, description="Names of the suppliers that were already known for an incremental search")
+    extracted_suppliers: Optional[List[Dict[str, Any]]] = Field(default=None, description="Suppliers extracted from this result, kept so a retried task does not extract again")
+    archived_at: Optional[datetime] = Field(default=None, description="When raw_ai_response was moved to an archive file")
+    archive_file: Optional[str] = Field(default=None, description="Compressed archive file holding raw_ai_response while archived")
 
     class Settings:
-        name = "search_results"
\ No newline at end of file
+        name = "search_results"
+        indexes = [
+            # Retention scans for old payloads that are still in the database
+            [("search_date", 1), ("archived_at", 1)],
+        ]
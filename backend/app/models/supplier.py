@@ -1,7 +1,7 @@
 from datetime import datetime
 from typing import List, Optional
 from beanie import Document, Indexed
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, model_validator
 
 
 class Supplier(Document):
@@ -10,18 +10,63 @@ class Supplier(Document):
     location: Optional[str] = None
     product: Optional[str] = None
     component_type: str
+    # Canonical key of component_type (app.canonical), shared by all its spelling variants
+    component_key: Optional[str] = None
     country: str
     lead_time_days: Optional[int] = None
     min_order_qty: Optional[int] = None
     certifications: Optional[List[str]] = Field(default_factory=list)
     summary: Optional[str] = None
     raw_ai_source: str
+    # Row stored in place of suppliers when extraction found none or failed
+    placeholder: bool = False
     created_at: datetime = Field(default_factory=datetime.utcnow)
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
 
     class Settings:
         name = "suppliers"
+        indexes = [
+            # Listing queries filter by component/country and look up the latest write
+            [("component_key", 1), ("country", 1), ("updated_at", -1)],
+            [("updated_at", -1)],
+        ]
         
 
+# Names given to placeholder rows, which were not flagged before the placeholder field existed
+PLACEHOLDER_NAME_PREFIXES = ("AI Search Results: ", "Error Processing: ")
+
+# Facts about a supplier that can be refreshed by an incremental search
+SUPPLIER_FACT_FIELDS = (
+    "website",
+    "location",
+    "product",
+    "lead_time_days",
+    "min_order_qty",
+    "certifications",
+    "summary",
+)
+
+
 class SupplierQuery(BaseModel):
     component: str
-    country: str
\ No newline at end of file
+    country: Optional[str] = Field(default=None, description="Country to search in")
+    countries: List[str] = Field(default_factory=list, description="Countries to search in concurrently, for comparing one component across countries")
+    full_refresh: bool = Field(default=False, description="Rediscover all suppliers instead of only searching for new ones and changed facts")
+
+    @model_validator(mode="after")
+    def check_countries(self) -> "SupplierQuery":
+        if not self.all_countries:
+            raise ValueError("Either country or countries must be given")
+        return self
+
+    @property
+    def all_countries(self) -> List[str]:
+        """
+        country followed by countries, without blanks or duplicates.
+        """
+        countries = []
+        for country in [self.country, *self.countries]:
+            country = (country or "").strip()
+            if country and country not in countries:
+                countries.append(country)
+        return countries
\ No newline at end of file
@@ -0,0 +1,44 @@
+from datetime import datetime
+from typing import Dict, List, Optional
+from beanie import Document
+from pydantic import BaseModel, Field
+from pymongo import ASCENDING, IndexModel
+
+
+class NumericDistribution(BaseModel):
+    """
+    Distribution of a numeric supplier field (lead time, MOQ) for one component/country.
+    """
+    known: int = Field(default=0, description="Number of suppliers with a value for this field")
+    min: Optional[float] = None
+    max: Optional[float] = None
+    avg: Optional[float] = None
+    buckets: Dict[str, int] = Field(default_factory=dict, description="Supplier counts per value range")
+
+
+class CertificationCount(BaseModel):
+    name: str
+    count: int
+    share: float = Field(..., description="Fraction of the suppliers holding this certification")
+
+
+class SupplierSummary(Document):
+    """
+    Precomputed analytics for the suppliers of one component in one country.
+    Maintained by app.analytics whenever suppliers for the pair are saved.
+    """
+    component_type: str = Field(..., description="One of the spellings the component's suppliers are stored under")
+    component_key: Optional[str] = Field(default=None, description="Canonical key of the component (app.canonical)")
+    country: str
+    supplier_count: int = 0
+    lead_time_days: NumericDistribution = Field(default_factory=NumericDistribution)
+    min_order_qty: NumericDistribution = Field(default_factory=NumericDistribution)
+    certifications: List[CertificationCount] = Field(default_factory=list)
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
+
+    class Settings:
+        name = "supplier_summaries"
+        indexes = [
+            IndexModel([("component_key", ASCENDING), ("country", ASCENDING)], unique=True),
+            [("country", 1)],
+        ]
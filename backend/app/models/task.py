@@ -1,8 +1,12 @@
 from enum import Enum
-from datetime import datetime
-from typing import Optional
+from datetime import datetime, timedelta
+from typing import List, Optional
 from beanie import Document, PydanticObjectId
-from pydantic import Field
+from pydantic import BaseModel, Field
+from pymongo import ASCENDING, IndexModel
+
+from app.canonical import component_key
+from app.settings import get_settings
 
 class TaskStatus(str, Enum):
     QUEUED = "queued"
@@ -10,15 +14,86 @@ class TaskStatus(str, Enum):
     COMPLETED = "completed"
     FAILED = "failed"
 
+class CountryProgress(BaseModel):
+    """
+    Progress of the search for one of a task's countries.
+    """
+    country: str
+    status: TaskStatus = Field(default=TaskStatus.QUEUED)
+    message: Optional[str] = None
+    # Stage checkpoints: search done once search_result_id is set, extraction done once
+    # extracted_count is set, persistence progress in persisted_count
+    search_result_id: Optional[PydanticObjectId] = None
+    extracted_count: Optional[int] = None
+    persisted_count: int = 0
+    supplier_count: Optional[int] = None
+    completed_at: Optional[datetime] = None
+
 class SupplierTask(Document):
     component: str
-    country: str
+    component_key: Optional[str] = Field(default=None, description="Canonical key of the component, shared by all its spelling variants")
+    requested_component: Optional[str] = Field(default=None, description="Component as submitted, when it was canonicalized to a known spelling")
+    country: str = Field(..., description="Country searched in; a comma separated label when the task covers several countries")
+    countries: List[str] = Field(default_factory=list, description="Every country searched by the task")
+    country_progress: List[CountryProgress] = Field(default_factory=list, description="Status of each country, updated as soon as it finishes")
     status: TaskStatus = Field(default=TaskStatus.QUEUED)
     message: Optional[str] = None
     search_result_id: Optional[PydanticObjectId] = None
     supplier_count: Optional[int] = None
     started_at: datetime = Field(default_factory=datetime.now)
     completed_at: Optional[datetime] = None
-    
+    is_refresh: bool = Field(default=False, description="Whether this task was scheduled by the background refresh")
+    full_refresh: bool = Field(default=False, description="Rediscover all suppliers instead of running an incremental search")
+    expires_at: Optional[datetime] = Field(default=None, description="When MongoDB deletes the finished task (UTC); unset while it is running")
+    lease_owner: Optional[str] = Field(default=None, description="Worker currently processing the task")
+    lease_expires_at: Optional[datetime] = Field(default=None, description="When the worker's lease runs out unless renewed (UTC)")
+
+    @classmethod
+    def for_countries(cls, component: str, countries: List[str], **fields) -> "SupplierTask":
+        """
+        New task searching a component in one or more countries.
+        """
+        return cls(
+            component=component,
+            component_key=component_key(component),
+            country=", ".join(countries),
+            countries=countries,
+            country_progress=[CountryProgress(country=country) for country in countries],
+            **fields
+        )
+
+    @property
+    def all_countries(self) -> List[str]:
+        # Tasks created before multi-country support only have country
+        return self.countries or [self.country]
+
+    def progress_for(self, country: str) -> Optional[CountryProgress]:
+        for progress in self.country_progress:
+            if progress.country == country:
+                return progress
+        return None
+
+    def finish(self, status: TaskStatus, message: str):
+        """
+        Mark the task as completed or failed and schedule its expiry.
+        The caller saves the task.
+        """
+        self.status = status
+        self.message = message
+        self.completed_at = datetime.now()
+        self.lease_owner = None
+        self.lease_expires_at = None
+        retention_days = get_settings().task_retention_days
+        if retention_days > 0:
+            self.expires_at = datetime.utcnow() + timedelta(days=retention_days)
+
     class Settings:
-        name = "supplier_tasks"
\ No newline at end of file
+        name = "supplier_tasks"
+        indexes = [
+            # Popularity aggregation over recent user-submitted tasks
+            [("started_at", -1), ("is_refresh", 1)],
+            [("component_key", 1), ("country", 1), ("status", 1)],
+            [("component_key", 1), ("countries", 1), ("status", 1)],
+            # TTL index: finished tasks are deleted once expires_at has passed
+            IndexModel([("expires_at", ASCENDING)], expireAfterSeconds=0),
+        ]
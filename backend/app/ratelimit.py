@@ -0,0 +1,82 @@
+import asyncio
+import logging
+import time
+import uuid
+from contextlib import asynccontextmanager
+from typing import Optional
+
+from app.clients import get_redis_client
+from app.settings import get_settings
+
+# Configure logger
+logger = logging.getLogger(__name__)
+
+# Take a lease if fewer than ARGV[2] unexpired leases exist.
+# KEYS[1]: lease set, ARGV: now, limit, lease expiry, lease token
+_ACQUIRE_SCRIPT = """
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', ARGV[1])
+if redis.call('ZCARD', KEYS[1]) < tonumber(ARGV[2]) then
+    redis.call('ZADD', KEYS[1], ARGV[3], ARGV[4])
+    return 1
+end
+return 0
+"""
+
+
+class SearchRateLimiter:
+    """
+    Limit on concurrent web searches shared by every API and worker process.
+
+    Each running search holds a lease in a Redis sorted set, scored by its expiry so
+    that leases of crashed processes are dropped after search_slot_timeout_seconds.
+    When Redis is unavailable searches proceed without the limit, like the cache.
+    """
+
+    def __init__(self, key: str = "ratelimit:web_search"):
+        self.key = key
+
+    async def acquire(self) -> Optional[str]:
+        """
+        Wait for a free slot and return its lease token (None if Redis is unavailable).
+        """
+        settings = get_settings()
+        token = uuid.uuid4().hex
+        delay = 0.25
+        waited = False
+        while True:
+            now = time.time()
+            try:
+                acquired = await get_redis_client().eval(
+                    _ACQUIRE_SCRIPT, 1, self.key,
+                    now, settings.search_concurrency_limit, now + settings.search_slot_timeout_seconds, token,
+                )
+            except Exception as e:
+                logger.warning("Search rate limiter unavailable, continuing without it: %s", e)
+                return None
+            if acquired:
+                return token
+            if not waited:
+                logger.info("All %s search slots are taken, waiting", settings.search_concurrency_limit)
+                waited = True
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 5.0)
+
+    async def release(self, token: Optional[str]):
+        if token is None:
+            return
+        try:
+            await get_redis_client().zrem(self.key, token)
+        except Exception as e:
+            # The lease expires on its own
+            logger.warning("Failed to release search slot: %s", e)
+
+    @asynccontextmanager
+    async def slot(self):
+        token = await self.acquire()
+        try:
+            yield
+        finally:
+            await self.release(token)
+
+
+search_rate_limiter = SearchRateLimiter()
@@ -0,0 +1,132 @@
+import logging
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+from app.canonical import component_key, query_canonicalizer
+from app.clients import get_celery_app
+from app.models.supplier import Supplier
+from app.models.task import SupplierTask, TaskStatus
+from app.settings import get_settings
+
+# Configure logger
+logger = logging.getLogger(__name__)
+
+
+async def popular_queries(window_days: int, top_n: int) -> List[Dict[str, Any]]:
+    """
+    Rank (component, country) pairs by how often users asked for them recently.
+    Tasks created by the background refresh itself are not counted. Spelling variants
+    count together, under one of their spellings.
+    """
+    since = datetime.now() - timedelta(days=window_days)
+    pipeline = [
+        {"$match": {"started_at": {"$gte": since}, "is_refresh": {"$ne": True}}},
+        # A multi-country task counts once for each of its countries
+        {"$unwind": {"path": "$countries", "preserveNullAndEmptyArrays": True}},
+        {"$group": {
+            "_id": {
+                "component_key": {"$ifNull": ["$component_key", "$component"]},
+                "country": {"$ifNull": ["$countries", "$country"]},
+            },
+            "component": {"$max": "$component"},
+            "requests": {"$sum": 1}
+        }},
+        {"$sort": {"requests": -1}},
+        {"$limit": top_n},
+    ]
+    results = await SupplierTask.aggregate(pipeline).to_list()
+    return [
+        {"component": row["component"], "country": row["_id"]["country"], "requests": row["requests"]}
+        for row in results
+    ]
+
+
+async def latest_supplier_write(component: Optional[str], country: Optional[str]) -> Optional[datetime]:
+    """
+    Time of the most recent supplier write for a filter (naive UTC, like Supplier.updated_at).
+    """
+    query = {}
+    if component:
+        query["component_key"] = component_key(component)
+    if country:
+        query["country"] = country
+    latest = await Supplier.get_motor_collection().find_one(query, projection={"created_at": 1, "updated_at": 1}, sort=[("updated_at", -1)])
+    return (latest.get("updated_at") or latest.get("created_at")) if latest else None
+
+
+async def refresh_popular_queries() -> Dict[str, Any]:
+    """
+    Queue background searches for popular queries whose supplier data is about to go stale.
+
+    A pair is refreshed once its newest supplier is older than refresh_ahead_fraction of
+    supplier_data_ttl_hours, so the refreshed data lands before the old data expires. The
+    previous suppliers stay in place and keep being served until the new ones are saved.
+    """
+    settings = get_settings()
+    ttl = timedelta(hours=settings.supplier_data_ttl_hours)
+    refresh_after = ttl * settings.refresh_ahead_fraction
+    now = datetime.utcnow()
+
+    candidates = await popular_queries(settings.refresh_popularity_window_days, settings.refresh_top_n)
+    logger.info("Checking %s popular queries for refresh", len(candidates))
+
+    queued = []
+    seen = set()
+    for candidate in candidates:
+        # Refresh under the spelling new queries are mapped to, once per canonical key
+        component, country = await query_canonicalizer.canonicalize(candidate["component"]), candidate["country"]
+        if (component_key(component), country) in seen:
+            continue
+        seen.add((component_key(component), country))
+        latest_write = await latest_supplier_write(component, country)
+        if latest_write and now - latest_write < refresh_after:
+            continue
+
+        # An incremental refresh that found nothing new leaves the suppliers untouched,
+        # so also count recently completed tasks as fresh (task times are local time)
+        recently_completed = await SupplierTask.find_one({
+            "component_key": component_key(component),
+            "$or": [{"country": country}, {"countries": country}],
+            "status": TaskStatus.COMPLETED.value,
+            "completed_at": {"$gte": datetime.now() - refresh_after},
+        })
+        if recently_completed:
+            continue
+
+        in_flight = await SupplierTask.find_one({
+            "component_key": component_key(component),
+            "$or": [{"country": country}, {"countries": country}],
+            "status": {"$in": [TaskStatus.QUEUED.value, TaskStatus.PROCESSING.value]},
+        })
+        if in_flight:
+            logger.debug("Skipping refresh of %s in %s, task %s already in flight", component, country, in_flight.id)
+            continue
+
+        task = SupplierTask.for_countries(
+            component,
+            [country],
+            status=TaskStatus.QUEUED,
+            message="Background refresh queued",
+            is_refresh=True
+        )
+        await task.create()
+        get_celery_app().send_task("process_supplier_query", args=[str(task.id), component, country, [country]])
+        logger.info("Queued background refresh task %s for %s in %s (last write: %s)", task.id, component, country, latest_write)
+        queued.append({"task_id": str(task.id), "component": component, "country": country})
+
+    return {"checked": len(candidates), "queued": queued}
+
+
+def data_age_headers(latest_write: Optional[datetime]) -> Dict[str, str]:
+    """
+    Response headers telling clients how old a supplier listing is and whether it is stale.
+    """
+    if latest_write is None:
+        return {}
+    age = max(0, int((datetime.utcnow() - latest_write).total_seconds()))
+    stale = age > get_settings().supplier_data_ttl_hours * 3600
+    return {
+        "X-Data-Updated-At": latest_write.isoformat(),
+        "X-Data-Age": str(age),
+        "X-Data-Stale": "true" if stale else "false",
+    }
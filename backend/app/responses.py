@@ -0,0 +1,89 @@
+import hashlib
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import orjson
+from fastapi import Request, Response
+
+from app.models.supplier import Supplier
+
+# Fields of the public Supplier representation, in declaration order, with their defaults.
+# Raw MongoDB documents are shaped into this so the output matches response_model=Supplier.
+_SUPPLIER_FIELDS = [
+    (name, field.get_default(call_default_factory=True))
+    for name, field in Supplier.model_fields.items()
+    if name not in ("id", "revision_id")
+]
+
+
+class ORJSONBytesResponse(Response):
+    """
+    Response for bodies that were already serialized to JSON bytes.
+    """
+    media_type = "application/json"
+
+
+def _default(value: Any):
+    # ObjectId and anything else orjson doesn't know natively
+    return str(value)
+
+
+def supplier_documents_to_json(documents: Iterable[Dict[str, Any]]) -> bytes:
+    """
+    Serialize raw supplier documents from MongoDB straight to JSON, skipping the
+    Pydantic model round trip that response_model=List[Supplier] would do.
+    """
+    shaped = []
+    for document in documents:
+        item = {"_id": str(document["_id"])}
+        for name, default in _SUPPLIER_FIELDS:
+            item[name] = document.get(name, default)
+        # Suppliers saved before updated_at existed were never updated after creation
+        item["updated_at"] = document.get("updated_at") or document.get("created_at")
+        shaped.append(item)
+    return orjson.dumps(shaped, default=_default)
+
+
+async def find_supplier_documents(query: Dict[str, Any], sort: Optional[List] = None, skip: int = 0, limit: int = 0) -> List[Dict[str, Any]]:
+    """
+    Fetch raw supplier documents without constructing Beanie models.
+    """
+    cursor = Supplier.get_motor_collection().find(query)
+    if sort:
+        cursor = cursor.sort(sort)
+    if skip:
+        cursor = cursor.skip(skip)
+    if limit:
+        cursor = cursor.limit(limit)
+    return await cursor.to_list(length=None)
+
+
+async def supplier_listing_state(query: Dict[str, Any], *variant: Any) -> Tuple[str, Optional[datetime]]:
+    """
+    Return a weak ETag for a supplier listing and the time of its latest write.
+    The ETag is derived from the number of matching documents and the newest
+    updated_at, plus any request variant (e.g. paging).
+    """
+    collection = Supplier.get_motor_collection()
+    count = await collection.count_documents(query)
+    latest = await collection.find_one(query, projection={"created_at": 1, "updated_at": 1}, sort=[("updated_at", -1)])
+    latest_write = (latest.get("updated_at") or latest.get("created_at")) if latest else None
+    fingerprint = orjson.dumps([query, count, latest_write, list(variant)], default=_default, option=orjson.OPT_SORT_KEYS)
+    return f'W/"{hashlib.sha1(fingerprint).hexdigest()}"', latest_write
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """
+    Check the request's If-None-Match header against an ETag (weak comparison).
+    """
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    candidates = [tag.strip().removeprefix("W/") for tag in header.split(",")]
+    return etag.removeprefix("W/") in candidates
+
+
+def not_modified(etag: str, headers: Optional[Dict[str, str]] = None) -> Response:
+    return Response(status_code=304, headers={"ETag": etag, **(headers or {})})
@@ -0,0 +1,250 @@
+"""
+Retention for the task and search result collections.
+
+Finished tasks carry an expires_at date covered by a TTL index, so MongoDB deletes them
+by itself once task_retention_days have passed. Search results older than
+search_result_archive_days have their raw_ai_response moved into a gzipped NDJSON file
+under archive_dir; the document itself stays (tasks reference it) and the payload can
+be restored from the file at any time.
+
+Command line usage (from the backend directory):
+
+    python -m app.retention                      # apply retention, print a report
+    python -m app.retention --restore <search_id>
+    python -m app.retention --restore-file archive/search_results-20250101T000000.ndjson.gz
+"""
+import argparse
+import asyncio
+import gzip
+import logging
+import os
+import sys
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Set
+
+import orjson
+from beanie import PydanticObjectId
+
+from app.models.search_result import SearchResult
+from app.models.task import SupplierTask, TaskStatus
+from app.settings import get_settings
+
+# Configure logger
+logger = logging.getLogger(__name__)
+
+ARCHIVE_BATCH_SIZE = 500
+
+
+async def collection_stats(document_model) -> Optional[Dict[str, int]]:
+    """
+    Document count, data size and index size of a collection, or None where collStats is unavailable.
+    Data size shrinks as soon as documents are deleted or trimmed; storage size only
+    once WiredTiger reuses or compacts the freed space.
+    """
+    collection = document_model.get_motor_collection()
+    try:
+        stats = await collection.database.command("collStats", collection.name)
+    except Exception as e:
+        logger.debug("collStats unavailable for %s: %s", collection.name, e)
+        return None
+    return {
+        "count": stats.get("count", 0),
+        "size": stats.get("size", 0),
+        "storage_size": stats.get("storageSize", 0),
+        "index_size": stats.get("totalIndexSize", 0),
+    }
+
+
+async def schedule_task_expiry(retention_days: float) -> int:
+    """
+    Give finished tasks saved before retention existed an expires_at date, so the TTL index covers them.
+    """
+    if retention_days <= 0:
+        return 0
+    result = await SupplierTask.get_motor_collection().update_many(
+        {
+            "status": {"$in": [TaskStatus.COMPLETED.value, TaskStatus.FAILED.value]},
+            "expires_at": None,
+        },
+        [{"$set": {"expires_at": {"$add": [
+            {"$ifNull": ["$completed_at", "$started_at"]},
+            int(retention_days * 86400 * 1000),
+        ]}}}],
+    )
+    return result.modified_count
+
+
+async def archive_search_results(older_than: datetime, archive_dir: str) -> Dict[str, Any]:
+    """
+    Move the payloads of search results older than a date into one compressed archive file.
+    The file is written completely before any document is trimmed.
+    """
+    collection = SearchResult.get_motor_collection()
+    query = {"search_date": {"$lt": older_than}, "archived_at": None}
+    if not await collection.count_documents(query, limit=1):
+        return {"archived": 0, "payload_bytes": 0, "archive_file": None, "archive_bytes": 0}
+
+    os.makedirs(archive_dir, exist_ok=True)
+    archived_at = datetime.utcnow()
+    path = os.path.join(archive_dir, f"search_results-{archived_at:%Y%m%dT%H%M%S}.ndjson.gz")
+    partial_path = path + ".partial"
+
+    ids = []
+    payload_bytes = 0
+    with gzip.open(partial_path, "wb") as archive:
+        cursor = collection.find(
+            query,
+            projection={"query_component": 1, "query_country": 1, "search_date": 1, "raw_ai_response": 1},
+            batch_size=ARCHIVE_BATCH_SIZE,
+        )
+        async for document in cursor:
+            document["_id"] = str(document["_id"])
+            archive.write(orjson.dumps(document, default=str) + b"\n")
+            payload_bytes += len(document.get("raw_ai_response") or "")
+            ids.append(document["_id"])
+    os.replace(partial_path, path)
+
+    for start in range(0, len(ids), ARCHIVE_BATCH_SIZE):
+        batch = [PydanticObjectId(search_id) for search_id in ids[start:start + ARCHIVE_BATCH_SIZE]]
+        await collection.update_many(
+            {"_id": {"$in": batch}},
+            {"$set": {"raw_ai_response": "", "archived_at": archived_at, "archive_file": path}},
+        )
+
+    logger.info("Archived %s search results (%s payload bytes) to %s", len(ids), payload_bytes, path)
+    return {
+        "archived": len(ids),
+        "payload_bytes": payload_bytes,
+        "archive_file": path,
+        "archive_bytes": os.path.getsize(path),
+    }
+
+
+def read_archive(path: str, search_ids: Optional[Set[str]] = None) -> Dict[str, str]:
+    """
+    Archived payloads by search result id, optionally limited to some ids.
+    """
+    payloads = {}
+    with gzip.open(path, "rb") as archive:
+        for line in archive:
+            document = orjson.loads(line)
+            if search_ids is None or document["_id"] in search_ids:
+                payloads[document["_id"]] = document["raw_ai_response"]
+    return payloads
+
+
+async def _restore_payloads(payloads: Dict[str, str]) -> int:
+    collection = SearchResult.get_motor_collection()
+    restored = 0
+    for search_id, raw_ai_response in payloads.items():
+        result = await collection.update_one(
+            {"_id": PydanticObjectId(search_id), "archived_at": {"$ne": None}},
+            {"$set": {"raw_ai_response": raw_ai_response, "archived_at": None, "archive_file": None}},
+        )
+        restored += result.modified_count
+    return restored
+
+
+async def restore_search_result(search_result: SearchResult) -> SearchResult:
+    """
+    Put an archived search result's payload back into the database.
+    Returns the search result unchanged if it is not archived.
+    """
+    if search_result.archived_at is None:
+        return search_result
+    search_id = str(search_result.id)
+    payloads = read_archive(search_result.archive_file, {search_id})
+    if search_id not in payloads:
+        raise ValueError(f"Search result {search_id} not found in archive {search_result.archive_file}")
+    await _restore_payloads(payloads)
+    logger.info("Restored search result %s from %s", search_id, search_result.archive_file)
+    search_result.raw_ai_response = payloads[search_id]
+    search_result.archived_at = None
+    search_result.archive_file = None
+    return search_result
+
+
+async def restore_archive(path: str) -> int:
+    """
+    Restore every search result payload held in an archive file. Returns the number restored.
+    """
+    restored = await _restore_payloads(read_archive(path))
+    logger.info("Restored %s search results from %s", restored, path)
+    return restored
+
+
+def _reclaimed(before: Optional[Dict[str, int]], after: Optional[Dict[str, int]]) -> Dict[str, Any]:
+    if before is None or after is None:
+        return {"before": before, "after": after, "reclaimed_bytes": None}
+    reclaimed = (before["size"] + before["index_size"]) - (after["size"] + after["index_size"])
+    return {"before": before, "after": after, "reclaimed_bytes": reclaimed}
+
+
+async def apply_retention() -> Dict[str, Any]:
+    """
+    Schedule expiry of finished tasks, archive old search result payloads and report
+    the space reclaimed in both collections.
+    """
+    settings = get_settings()
+    tasks_before = await collection_stats(SupplierTask)
+    results_before = await collection_stats(SearchResult)
+
+    expiring = await schedule_task_expiry(settings.task_retention_days)
+    archive = await archive_search_results(
+        datetime.now() - timedelta(days=settings.search_result_archive_days),
+        settings.archive_dir,
+    )
+    # The TTL monitor deletes expired tasks in the background (about once a minute)
+    pending_expiry = await SupplierTask.find({"expires_at": {"$lte": datetime.utcnow()}}).count()
+
+    report = {
+        "tasks": {
+            "retention_days": settings.task_retention_days,
+            "expiry_scheduled": expiring,
+            "pending_expiry": pending_expiry,
+            "collection": _reclaimed(tasks_before, await collection_stats(SupplierTask)),
+        },
+        "search_results": {
+            "archive_after_days": settings.search_result_archive_days,
+            **archive,
+            "collection": _reclaimed(results_before, await collection_stats(SearchResult)),
+        },
+    }
+    logger.info(
+        "Retention applied: %s tasks scheduled for expiry, %s pending expiry, %s search results archived",
+        expiring, pending_expiry, archive["archived"],
+    )
+    return report
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Apply retention to tasks and search results, or restore archived search results.")
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument("--restore", metavar="SEARCH_ID", help="Restore one archived search result")
+    group.add_argument("--restore-file", metavar="PATH", help="Restore every search result in an archive file")
+    args = parser.parse_args(argv)
+
+    from app.db import init_db
+    from app.logging_config import configure_logging
+
+    # Logs go to stderr so that stdout can carry the report
+    configure_logging(service="retention", stream=sys.stderr)
+
+    async def _run():
+        await init_db()
+        if args.restore:
+            search_result = await SearchResult.get(PydanticObjectId(args.restore))
+            if not search_result:
+                raise SystemExit(f"Search result {args.restore} not found")
+            await restore_search_result(search_result)
+            return {"restored": 1}
+        if args.restore_file:
+            return {"restored": await restore_archive(args.restore_file)}
+        return await apply_retention()
+
+    result = asyncio.run(_run())
+    sys.stdout.buffer.write(orjson.dumps(result, option=orjson.OPT_INDENT_2) + b"\n")
+
+
+if __name__ == "__main__":
+    main()
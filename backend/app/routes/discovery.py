@@ -1,5 +1,9 @@
-from fastapi import APIRouter, HTTPException, Query, Depends, Path
+from fastapi import APIRouter, Header, HTTPException, Query, Depends, Path, Request, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, StreamingResponse
 from typing import List, Optional
+import asyncio
+import time
 import traceback
 import logging
 from datetime import datetime
@@ -10,88 +14,265 @@ from app.models.search_result import SearchResult
 from app.models.task import SupplierTask, TaskStatus
 from app.ai.web_search import search_suppliers
 from app.ai.summarizer import process_search_result
-from app.worker import process_supplier_query  # Import Celery task
+from app.admission import AdmissionRejected, sync_query_admission
+from app.analytics import get_supplier_analytics
+from app.cache import supplier_cache
+from app.canonical import component_key, query_canonicalizer
+from app.clients import get_celery_app
+from app.export import (
+    EXPORT_FORMATS,
+    ExportError,
+    build_export_query,
+    check_export_format,
+    resolve_fields,
+    stream_suppliers,
+)
+from app.idempotency import IdempotencyError, claim_idempotency_key, release_idempotency_key
+from app.responses import (
+    ORJSONBytesResponse,
+    etag_matches,
+    find_supplier_documents,
+    not_modified,
+    supplier_documents_to_json,
+    supplier_listing_state,
+)
+from app.refresh import data_age_headers
+from app.settings import get_settings
+from app.retention import restore_search_result
+from app.suppliers import find_known_suppliers, known_supplier_identities, save_suppliers
 
 # Configure logger
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/discovery", tags=["discovery"])
 
-@router.post("/query", response_model=List[Supplier])
-async def query_suppliers(query: SupplierQuery):
+async def _supplier_listing_response(request: Request, component: Optional[str], country: Optional[str], skip: int = 0, limit: int = 0, countries: Optional[List[str]] = None) -> Response:
+    """
+    Serve a supplier listing through the Redis read-through cache.
+    Both cached and freshly loaded listings honour If-None-Match and report the age
+    of the data, which may be stale while a background refresh is running.
+    countries lists several countries to include instead of a single country.
+    Suppliers stored under any spelling of the component are included.
+    """
+    started = time.perf_counter()
+    query = {}
+    variant = f"{skip}:{limit}"
+    # Listings are filtered and cached by canonical key, like save_suppliers invalidates them
+    key = component_key(component) if component else None
+    if key:
+        query["component_key"] = key
+    if countries:
+        # Cached under the component-wide generation, which any of the countries invalidates
+        query["country"] = {"$in": countries}
+        variant = f"{','.join(sorted(countries))}:{variant}"
+    elif country:
+        query["country"] = country
+    logger.debug("Database query filters: %s", query)
+
+    cache_key, cached = await supplier_cache.lookup(key, None if countries else country, variant)
+    if cached:
+        etag, body, latest_write = cached
+        supplier_cache.record("hit", started)
+        headers = data_age_headers(latest_write)
+        if etag_matches(request, etag):
+            return not_modified(etag, headers)
+        return ORJSONBytesResponse(body, headers={"ETag": etag, "X-Cache": "HIT", **headers})
+
+    # Short-circuit with 304 if nothing was written since the client's copy
+    etag, latest_write = await supplier_listing_state(query, skip, limit)
+    headers = data_age_headers(latest_write)
+    if etag_matches(request, etag):
+        supplier_cache.record("miss", started)
+        return not_modified(etag, headers)
+
+    suppliers = await find_supplier_documents(query, sort=[("updated_at", -1)], skip=skip, limit=limit)
+    logger.info("Database query completed in %s seconds, found %s suppliers", time.perf_counter() - started, len(suppliers))
+    body = supplier_documents_to_json(suppliers)
+    await supplier_cache.store(cache_key, etag, body, latest_write)
+    supplier_cache.record("miss", started)
+    return ORJSONBytesResponse(body, headers={"ETag": etag, "X-Cache": "MISS", **headers})
+
+async def _discover_country(component: str, country: str, full_refresh: bool) -> int:
+    """
+    Search, extract and merge suppliers for one country. Returns the number saved.
+    """
+    # Step 1: Use AI to search for suppliers and save the raw results
+    logger.info("Step 1: Starting AI-powered supplier search in %s", country)
+    known = await find_known_suppliers(component, country)
+    search_result = await search_suppliers(
+        component=component, 
+        country=country,
+        known_suppliers=[] if full_refresh else known_supplier_identities(known)
+    )
+    # Save the search result to MongoDB
+    await search_result.create()
+    logger.info("Saved search result to database with ID: %s", search_result.id)
+    
+    # Step 2: Process the search result into structured supplier objects
+    logger.info("Step 2: Processing search results for %s into structured supplier data", country)
+    from app.ai.summarizer import process_search_result
+    suppliers = await process_search_result(search_result)
+    
+    # Step 3: Merge the structured suppliers into the database
+    return await save_suppliers(suppliers, known=known)
+
+async def _canonical_query(query: SupplierQuery) -> SupplierQuery:
+    """
+    The query with its component mapped to the spelling already used for it, so that
+    variants share suppliers, cache entries and results.
+    """
+    component = await query_canonicalizer.canonicalize(query.component)
+    if component == query.component:
+        return query
+    return query.model_copy(update={"component": component})
+
+def _wants_async(request: Request) -> bool:
+    prefer = request.headers.get("prefer", "")
+    return get_settings().sync_query_redirect_to_async or "respond-async" in prefer.lower()
+
+async def _redirect_to_async(query: SupplierQuery, requested_component: str) -> JSONResponse:
+    task = await _queue_supplier_task(query, requested_component=requested_component)
+    logger.info("Synchronous query slots exhausted, queued task %s instead", task.id)
+    return JSONResponse(
+        status_code=202,
+        content=jsonable_encoder(task),
+        headers={"Location": f"{router.prefix}/tasks/{task.id}"}
+    )
+
+@router.post("/query", response_model=List[Supplier], responses={202: {"model": SupplierTask}})
+async def query_suppliers(query: SupplierQuery, request: Request, response: Response):
     """
     Search for suppliers based on component and country using AI.
-    The results are saved to the database.
+    The results are merged into the database. If suppliers are already stored for the
+    component/country, only new suppliers and changed facts are searched for unless
+    full_refresh is set. Returns all suppliers stored for the component/country.
+    Several countries are searched concurrently; countries whose search failed are
+    listed in the X-Failed-Countries header.
+
+    Concurrent synchronous queries are capped. When all slots are taken the request
+    waits in a bounded queue; past that it gets 429 (queue full) or 503 (waited too
+    long) with Retry-After. With "Prefer: respond-async" (or
+    SYNC_QUERY_REDIRECT_TO_ASYNC) it is queued as an async task instead and gets
+    202 with the task and its Location.
     """
+    requested_component = query.component
+    query = await _canonical_query(query)
+    if sync_query_admission.at_capacity and _wants_async(request):
+        return await _redirect_to_async(query, requested_component)
+    try:
+        async with sync_query_admission.admit():
+            return await _run_supplier_query(query, response)
+    except AdmissionRejected as e:
+        logger.warning("Rejected supplier query with %s: %s", e.status_code, e.detail)
+        raise HTTPException(status_code=e.status_code, detail=e.detail, headers={"Retry-After": str(e.retry_after)})
+
+async def _run_supplier_query(query: SupplierQuery, response: Response) -> List[Supplier]:
     start_time = datetime.now()
-    logger.info(f"Received supplier query request - component: '{query.component}', country: '{query.country}'")
+    countries = query.all_countries
+    logger.info("Received supplier query request - component: '%s', countries: %s", query.component, countries)
     try:
-        # Step 1: Use AI to search for suppliers and save the raw results
-        logger.info("Step 1: Starting AI-powered supplier search")
-        search_result = await search_suppliers(
-            component=query.component, 
-            country=query.country
+        outcomes = await asyncio.gather(
+            *(_discover_country(query.component, country, query.full_refresh) for country in countries),
+            return_exceptions=True
         )
-        # Save the search result to MongoDB
-        await search_result.create()
-        logger.info(f"Saved search result to database with ID: {search_result.id}")
-        
-        # Step 2: Process the search result into structured supplier objects
-        logger.info("Step 2: Processing search results into structured supplier data")
-        from app.ai.summarizer import process_search_result
-        suppliers = await process_search_result(search_result)
-        
-        # Step 3: Save the structured suppliers to the database
-        logger.debug(f"Saving {len(suppliers)} extracted suppliers to database")
-        saved_count = 0
-        for i, supplier in enumerate(suppliers):
-            try:
-                logger.debug(f"Saving supplier {i+1}/{len(suppliers)}: {supplier.name}")
-                await supplier.create()
-                saved_count += 1
-            except Exception as save_error:
-                logger.error(f"Failed to save supplier '{supplier.name}' to database: {str(save_error)}")
-        
-        logger.info(f"Successfully saved {saved_count}/{len(suppliers)} suppliers to database")
+        failed = [country for country, outcome in zip(countries, outcomes) if isinstance(outcome, Exception)]
+        for country, outcome in zip(countries, outcomes):
+            if isinstance(outcome, Exception):
+                logger.error("Supplier discovery failed for %s: %s", country, outcome)
+        if len(failed) == len(countries):
+            raise outcomes[0]
+        if failed:
+            response.headers["X-Failed-Countries"] = ", ".join(failed)
         
         end_time = datetime.now()
         duration = (end_time - start_time).total_seconds()
-        logger.info(f"Supplier discovery and processing completed in {duration} seconds")
+        logger.info("Supplier discovery and processing completed in %s seconds", duration)
         
-        return suppliers
+        if len(countries) == 1:
+            return await find_known_suppliers(query.component, countries[0])
+        return await Supplier.find({"component_key": component_key(query.component), "country": {"$in": countries}}).to_list()
     except Exception as e:
         error_traceback = traceback.format_exc()
-        logger.error(f"Error processing supplier query: {str(e)}")
-        logger.debug(f"Full traceback: {error_traceback}")
+        logger.error("Error processing supplier query: %s", e)
+        logger.debug("Full traceback: %s", error_traceback)
         raise HTTPException(status_code=500, detail=f"Error processing supplier query: {str(e)}")
 
 @router.post("/query/async", response_model=SupplierTask)
-async def async_query_suppliers(query: SupplierQuery):
+async def async_query_suppliers(
+    query: SupplierQuery,
+    response: Response,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key", max_length=255, description="Repeated submissions with the same key return the original task")
+):
     """
     Asynchronously search for suppliers based on component and country using AI.
     Returns a task that can be used to check status and retrieve results when ready.
+    With several countries, each country's status is reported in country_progress and
+    its results can be fetched as soon as it completes.
+
+    Retries with the same Idempotency-Key (within IDEMPOTENCY_KEY_TTL_HOURS) return
+    the task of the first submission with Idempotent-Replayed: true, and don't start
+    another search.
     """
-    logger.info(f"Received async supplier query - component: '{query.component}', country: '{query.country}'")
+    logger.info("Received async supplier query - component: '%s', countries: %s", query.component, query.all_countries)
+    requested_component = query.component
+    payload = query.model_dump()
+    query = await _canonical_query(query)
+    if not idempotency_key:
+        return await _queue_supplier_task(query, requested_component=requested_component)
+
+    try:
+        task_id, task = await claim_idempotency_key(idempotency_key, payload)
+    except IdempotencyError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail, headers={"Retry-After": "1"} if e.status_code == 409 else None)
+    if task is not None:
+        response.headers["Idempotent-Replayed"] = "true"
+        return task
+    try:
+        return await _queue_supplier_task(query, requested_component=requested_component, task_id=task_id)
+    except Exception:
+        await release_idempotency_key(idempotency_key)
+        raise
+
+async def _queue_supplier_task(query: SupplierQuery, requested_component: Optional[str] = None, task_id: Optional[PydanticObjectId] = None) -> SupplierTask:
+    """
+    Create a task for a (canonicalized) query and publish it to the worker.
+    """
+    countries = query.all_countries
     
     # Create and save a new task
-    task = SupplierTask(
-        component=query.component,
-        country=query.country,
+    task = SupplierTask.for_countries(
+        query.component,
+        countries,
         status=TaskStatus.QUEUED,
-        message="Task queued, waiting to start processing"
+        message="Task queued, waiting to start processing",
+        full_refresh=query.full_refresh,
+        requested_component=requested_component if requested_component != query.component else None
     )
+    if task_id is not None:
+        task.id = task_id
     await task.create()
     
-    # Start the Celery task
-    process_supplier_query.delay(
-        str(task.id),
-        query.component, 
-        query.country
-    )
+    # Start the Celery task by name so the API never imports the worker module
+    try:
+        get_celery_app().send_task(
+            "process_supplier_query",
+            args=[str(task.id), query.component, countries[0], countries]
+        )
+    except Exception:
+        # A task that was never published would sit in the queued state forever
+        await task.delete()
+        raise
     
-    logger.info(f"Created task {task.id} for async supplier query and dispatched to Celery")
+    logger.info("Created task %s for async supplier query and dispatched to Celery", task.id)
     return task
 
+@router.get("/query/admission")
+async def get_admission_stats():
+    """
+    Running, waiting, admitted and rejected synchronous queries in this API process.
+    """
+    return sync_query_admission.report()
+
 @router.get("/tasks/{task_id}", response_model=SupplierTask)
 async def get_task_status(task_id: str):
     """
@@ -106,13 +287,18 @@ async def get_task_status(task_id: str):
     except ValueError:
         raise HTTPException(status_code=400, detail=f"Invalid task ID format: {task_id}")
     except Exception as e:
-        logger.error(f"Error retrieving task {task_id}: {str(e)}")
+        logger.error("Error retrieving task %s: %s", task_id, e)
         raise HTTPException(status_code=500, detail=f"Error retrieving task: {str(e)}")
 
 @router.get("/tasks/{task_id}/results", response_model=List[Supplier])
-async def get_task_results(task_id: str):
+async def get_task_results(
+    task_id: str,
+    request: Request,
+    country: Optional[str] = Query(None, description="Only this country's results, available as soon as the country completes")
+):
     """
     Get the results of a completed supplier query task.
+    Supports conditional GETs: an unchanged result set returns 304 Not Modified.
     """
     try:
         # Convert task_id to PydanticObjectId
@@ -123,6 +309,24 @@ async def get_task_results(task_id: str):
         if not task:
             raise HTTPException(status_code=404, detail=f"Task {task_id} not found")
             
+        if country:
+            if country not in task.all_countries:
+                raise HTTPException(status_code=404, detail=f"Task {task_id} does not search {country}")
+            progress = task.progress_for(country)
+            if progress is not None and progress.status != TaskStatus.COMPLETED:
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"{country} is not completed yet. Current status: {progress.status}, message: {progress.message}"
+                )
+            if progress is None and task.status != TaskStatus.COMPLETED:
+                raise HTTPException(
+                    status_code=400, 
+                    detail=f"Task is not completed yet. Current status: {task.status}, message: {task.message}"
+                )
+            return await _supplier_listing_response(
+                request, task.component, country, limit=(progress.supplier_count if progress else task.supplier_count) or 100
+            )
+        
         if task.status != TaskStatus.COMPLETED:
             raise HTTPException(
                 status_code=400, 
@@ -130,84 +334,115 @@ async def get_task_results(task_id: str):
             )
         
         # Get suppliers associated with this task's search
-        suppliers = await Supplier.find(
-            {"component_type": task.component, "country": task.country}
-        ).sort(("created_at", -1)).limit(task.supplier_count or 100).to_list()
-        
-        if not suppliers:
-            logger.warning(f"No suppliers found for completed task {task_id}")
-        
-        return suppliers
+        countries = task.all_countries
+        if len(countries) > 1:
+            return await _supplier_listing_response(
+                request, task.component, None, limit=task.supplier_count or 100, countries=countries
+            )
+        return await _supplier_listing_response(
+            request, task.component, countries[0], limit=task.supplier_count or 100
+        )
     except ValueError:
         raise HTTPException(status_code=400, detail=f"Invalid task ID format: {task_id}")
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Error retrieving results for task {task_id}: {str(e)}")
+        logger.error("Error retrieving results for task %s: %s", task_id, e)
         raise HTTPException(status_code=500, detail=f"Error retrieving results: {str(e)}")
 
 @router.get("/results", response_model=List[Supplier])
 async def get_suppliers(
+    request: Request,
     component: Optional[str] = Query(None, description="Component type to filter by"),
-    country: Optional[str] = Query(None, description="Country to filter by")
+    country: Optional[str] = Query(None, description="Country to filter by"),
+    skip: int = Query(0, ge=0, description="Number of suppliers to skip"),
+    limit: int = Query(0, ge=0, description="Maximum number of suppliers to return (0 for no limit)")
 ):
     """
-    Retrieve suppliers from the database with optional filtering by component and country.
+    Retrieve suppliers from the database with optional filtering by component and country,
+    newest first. Results are served from the Redis cache when possible and support
+    conditional GETs: an unchanged result set returns 304 Not Modified.
+    Spelling variants of a known component are matched to it.
     """
-    logger.info(f"Received request for suppliers - component filter: '{component}', country filter: '{country}'")
-    
-    # Build query based on provided filters
-    query = {}
-    if component:
-        query["component_type"] = component
-    if country:
-        query["country"] = country
-    
-    logger.debug(f"Database query filters: {query}")
+    logger.info("Received request for suppliers - component filter: '%s', country filter: '%s'", component, country)
     
     try:
-        # Fetch suppliers from database
-        start_time = datetime.now()
-        
-        if query:
-            logger.debug(f"Executing filtered find query")
-            suppliers = await Supplier.find(query).to_list()
-        else:
-            logger.debug(f"Executing find_all query")
-            suppliers = await Supplier.find_all().to_list()
-        
-        end_time = datetime.now()
-        query_duration = (end_time - start_time).total_seconds()
-        logger.info(f"Database query completed in {query_duration} seconds, found {len(suppliers)} suppliers")
-        
-        if not suppliers:
-            logger.info("No matching suppliers found")
-            return []
-        
-        return suppliers
+        component = await query_canonicalizer.lookup(component)
+        return await _supplier_listing_response(request, component, country, skip=skip, limit=limit)
         
     except Exception as e:
         error_traceback = traceback.format_exc()
-        logger.error(f"Error retrieving suppliers: {str(e)}")
-        logger.debug(f"Full traceback: {error_traceback}")
+        logger.error("Error retrieving suppliers: %s", e)
+        logger.debug("Full traceback: %s", error_traceback)
         raise HTTPException(status_code=500, detail=f"Error retrieving suppliers: {str(e)}")
 
+@router.get("/export")
+async def export_suppliers(
+    format: str = Query("ndjson", description="Export format: ndjson, csv or parquet"),
+    component: Optional[str] = Query(None, description="Component type to filter by"),
+    country: Optional[str] = Query(None, description="Country to filter by"),
+    fields: Optional[str] = Query(None, description="Comma separated list of fields to export")
+):
+    """
+    Stream suppliers straight from a MongoDB cursor as NDJSON, CSV or Parquet.
+    Memory use is constant regardless of the number of suppliers exported.
+    """
+    logger.info("Received export request - format: '%s', component filter: '%s', country filter: '%s'", format, component, country)
+    try:
+        export_fields = resolve_fields(fields.split(",") if fields else None)
+        check_export_format(format)
+    except ExportError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    query = build_export_query(await query_canonicalizer.lookup(component), country)
+    filename = f"suppliers.{format}"
+    return StreamingResponse(
+        stream_suppliers(format, query, export_fields),
+        media_type=EXPORT_FORMATS[format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+@router.get("/cache/stats")
+async def get_cache_stats():
+    """
+    Hit ratio and latency of the supplier listing cache, for this process and globally.
+    """
+    return await supplier_cache.report()
+
+@router.get("/analytics")
+async def get_analytics(
+    component: Optional[str] = Query(None, description="Component type to filter by"),
+    country: Optional[str] = Query(None, description="Country to filter by")
+):
+    """
+    Supplier counts, lead time and MOQ distributions and certification coverage per
+    component/country, read from the precomputed summary collection.
+    """
+    try:
+        return await get_supplier_analytics(await query_canonicalizer.lookup(component), country)
+    except Exception as e:
+        logger.error("Error retrieving supplier analytics: %s", e, exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Error retrieving analytics: {str(e)}")
+
 @router.post("/process-search/{search_id}", response_model=List[Supplier])
 async def process_search_result_by_id(search_id: str = Path(..., description="ID of the search result to process")):
     """
     Process a specific search result by its ID and create structured supplier objects.
     This endpoint is useful for testing the supplier extraction and summarization independently.
     """
-    logger.info(f"Received request to process search result with ID: {search_id}")
+    logger.info("Received request to process search result with ID: %s", search_id)
     
     try:
         # Find the search result by ID
         search_result = await SearchResult.get(search_id)
         if not search_result:
-            logger.warning(f"Search result with ID {search_id} not found")
+            logger.warning("Search result with ID %s not found", search_id)
             raise HTTPException(status_code=404, detail=f"Search result with ID {search_id} not found")
         
-        logger.info(f"Found search result for {search_result.query_component} in {search_result.query_country}")
+        logger.info("Found search result for %s in %s", search_result.query_component, search_result.query_country)
+        
+        # Old payloads live in the archive until they are needed again
+        search_result = await restore_search_result(search_result)
         
         # Process the search result into structured supplier objects
         logger.info("Processing search result into structured supplier data")
@@ -217,20 +452,10 @@ async def process_search_result_by_id(search_id: str = Path(..., description="ID
         
         end_time = datetime.now()
         processing_duration = (end_time - start_time).total_seconds()
-        logger.info(f"Processing completed in {processing_duration} seconds, found {len(suppliers)} suppliers")
+        logger.info("Processing completed in %s seconds, found %s suppliers", processing_duration, len(suppliers))
         
         # Save the structured suppliers to the database
-        logger.debug(f"Saving {len(suppliers)} extracted suppliers to database")
-        saved_count = 0
-        for i, supplier in enumerate(suppliers):
-            try:
-                logger.debug(f"Saving supplier {i+1}/{len(suppliers)}: {supplier.name}")
-                await supplier.create()
-                saved_count += 1
-            except Exception as save_error:
-                logger.error(f"Failed to save supplier '{supplier.name}' to database: {str(save_error)}")
-        
-        logger.info(f"Successfully saved {saved_count}/{len(suppliers)} suppliers to database")
+        await save_suppliers(suppliers)
         
         return suppliers
         
@@ -239,6 +464,6 @@ async def process_search_result_by_id(search_id: str = Path(..., description="ID
             raise e
         
         error_traceback = traceback.format_exc()
-        logger.error(f"Error processing search result: {str(e)}")
-        logger.debug(f"Full traceback: {error_traceback}")
+        logger.error("Error processing search result: %s", e)
+        logger.debug("Full traceback: %s", error_traceback)
         raise HTTPException(status_code=500, detail=f"Error processing search result: {str(e)}")
\ No newline at end of file
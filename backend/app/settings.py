@@ -0,0 +1,90 @@
+import os
+import urllib.parse
+from functools import lru_cache
+from typing import Optional
+from dotenv import load_dotenv
+from pydantic import BaseModel
+
+
+class Settings(BaseModel):
+    """
+    Process-wide configuration read from the environment (and .env) exactly once.
+    """
+    anthropic_api_key: Optional[str] = None
+    mongodb_user: str = "admin"
+    mongodb_password: str = "password"
+    mongodb_host: str = "localhost"
+    mongodb_port: str = "27017"
+    mongodb_db_name: str = "procurement_assistant"
+    redis_url: str = "redis://localhost:6379/0"
+    redis_socket_timeout: float = 0.5
+    supplier_cache_enabled: bool = True
+    supplier_cache_ttl_seconds: int = 86400
+    # Supplier data older than this is considered stale
+    supplier_data_ttl_hours: float = 168
+    # Background refresh of popular (component, country) queries
+    refresh_interval_minutes: float = 60
+    refresh_top_n: int = 20
+    refresh_popularity_window_days: int = 30
+    refresh_ahead_fraction: float = 0.8
+    # Web searches running at once across all processes; a slot held longer than the
+    # timeout (e.g. by a crashed worker) is released automatically
+    search_concurrency_limit: int = 4
+    search_slot_timeout_seconds: float = 900
+    # Admission control for the synchronous /discovery/query endpoint (per API process);
+    # sync_query_max_concurrent = 0 disables it
+    sync_query_max_concurrent: int = 4
+    sync_query_max_queued: int = 8
+    sync_query_queue_timeout_seconds: float = 10
+    sync_query_retry_after_seconds: int = 60
+    # Queue an async task instead of rejecting when all slots are taken
+    sync_query_redirect_to_async: bool = False
+    # How long an Idempotency-Key keeps returning the task of its first submission
+    idempotency_key_ttl_hours: float = 24
+    # Workers hold a renewable lease on the task they process; a delivery of a leased task
+    # is rescheduled until the lease runs out (crashed worker) or the task is finished
+    task_lease_seconds: float = 300
+    # Query canonicalization: JSON synonym table ({"canonical": ["variant", ...]}) merged
+    # into the defaults, minimum trigram similarity for fuzzy matches, index reload interval
+    query_synonyms_file: Optional[str] = None
+    query_similarity_threshold: float = 0.75
+    query_index_refresh_seconds: float = 300
+    # Retention: finished tasks expire after task_retention_days (0 keeps them forever),
+    # search result payloads older than search_result_archive_days move to archive_dir
+    task_retention_days: float = 90
+    search_result_archive_days: float = 30
+    archive_dir: str = "archive"
+    retention_interval_hours: float = 24
+
+    @classmethod
+    def from_env(cls) -> "Settings":
+        values = {}
+        for name in cls.model_fields:
+            value = os.getenv(name.upper())
+            if value is not None:
+                values[name] = value
+        return cls(**values)
+
+    def _mongo_uri(self, password: str) -> str:
+        # URL encode the username and password to handle special characters.
+        # The authSource=admin is critical because MongoDB stores user credentials in the admin database by default
+        username = urllib.parse.quote_plus(self.mongodb_user)
+        return f"mongodb://{username}:{password}@{self.mongodb_host}:{self.mongodb_port}/{self.mongodb_db_name}?authSource=admin"
+
+    @property
+    def mongo_uri(self) -> str:
+        return self._mongo_uri(urllib.parse.quote_plus(self.mongodb_password))
+
+    @property
+    def sanitized_mongo_uri(self) -> str:
+        """Connection URI safe for logging (password masked)."""
+        return self._mongo_uri("***")
+
+
+@lru_cache(maxsize=None)
+def get_settings() -> Settings:
+    """
+    Load environment variables and build the settings object on first use.
+    """
+    load_dotenv()
+    return Settings.from_env()
@@ -0,0 +1,147 @@
+import logging
+import re
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from app.analytics import refresh_supplier_summary
+from app.cache import supplier_cache
+from app.canonical import component_key
+from app.models.supplier import PLACEHOLDER_NAME_PREFIXES, Supplier, SUPPLIER_FACT_FIELDS
+
+# Configure logger
+logger = logging.getLogger(__name__)
+
+# Legal-form suffixes ignored when comparing supplier names
+_LEGAL_SUFFIXES = {
+    "ag", "bv", "co", "company", "corp", "corporation", "gmbh", "inc", "kg", "limited",
+    "llc", "ltd", "plc", "pvt", "sa", "sas", "spa", "srl", "sro",
+}
+
+
+def supplier_identity(name: Optional[str], website: Optional[str] = None) -> str:
+    """
+    Stable identity for a supplier: its website domain when known, otherwise its
+    name without punctuation and legal-form suffixes.
+    """
+    if website:
+        domain = re.sub(r"^[a-z]+://", "", website.strip().lower())
+        domain = domain.split("/")[0].removeprefix("www.")
+        if domain:
+            return f"web:{domain}"
+    words = re.sub(r"[^\w\s]", " ", (name or "").lower()).split()
+    while words and words[-1] in _LEGAL_SUFFIXES:
+        words.pop()
+    return "name:" + " ".join(words)
+
+
+def is_placeholder(supplier: Supplier) -> bool:
+    """
+    Whether a stored row stands in for suppliers that could not be extracted.
+    """
+    return supplier.placeholder or supplier.name.startswith(PLACEHOLDER_NAME_PREFIXES)
+
+
+async def find_known_suppliers(component: str, country: str) -> List[Supplier]:
+    """
+    Suppliers already stored for a (component, country) pair, under any spelling of the component.
+    """
+    return await Supplier.find({"component_key": component_key(component), "country": country}).to_list()
+
+
+def known_supplier_identities(known: List[Supplier]) -> List[Dict[str, Any]]:
+    """
+    Name/website pairs passed to an incremental search, one per distinct supplier.
+    Placeholders are left out, so a pair with only a placeholder gets a full search.
+    """
+    identities = {}
+    for supplier in known:
+        if is_placeholder(supplier):
+            continue
+        identities.setdefault(supplier_identity(supplier.name, supplier.website), {"name": supplier.name, "website": supplier.website})
+    return list(identities.values())
+
+
+async def save_suppliers(suppliers: List[Supplier], known: Optional[List[Supplier]] = None, on_progress: Optional[Callable[[int], Awaitable[None]]] = None) -> int:
+    """
+    Save extracted suppliers to the database, invalidate the cached listings that
+    can contain them and refresh their analytics summaries. Returns the number of
+    suppliers created or updated.
+
+    Suppliers that match an already stored supplier for the same component/country
+    (by canonical component key, then website domain or normalized name) are merged into it: only the facts that
+    were extracted are overwritten. Pass the already loaded suppliers as known to
+    avoid querying them again. on_progress is awaited with the number of suppliers
+    handled so far after each one.
+    """
+    logger.debug("Saving %s extracted suppliers to database", len(suppliers))
+    created_count = 0
+    updated_count = 0
+    touched = set()
+    existing_by_pair = {}
+    if known is not None:
+        for supplier in known:
+            existing_by_pair.setdefault((supplier.component_key, supplier.country), []).append(supplier)
+
+    for i, supplier in enumerate(suppliers):
+        supplier.component_key = component_key(supplier.component_type)
+        pair = (supplier.component_key, supplier.country)
+        try:
+            if pair not in existing_by_pair:
+                existing_by_pair[pair] = await find_known_suppliers(supplier.component_type, supplier.country)
+            existing = _match_existing(supplier, existing_by_pair[pair])
+
+            if existing is None:
+                logger.debug("Saving supplier %s/%s: %s", i+1, len(suppliers), supplier.name)
+                await supplier.create()
+                existing_by_pair[pair].append(supplier)
+                created_count += 1
+            else:
+                changes = _merge_changes(supplier, existing)
+                if not changes:
+                    logger.debug("Supplier %s/%s unchanged: %s", i+1, len(suppliers), supplier.name)
+                    continue
+                logger.debug("Updating supplier %s/%s: %s (%s)", i+1, len(suppliers), existing.name, sorted(changes))
+                changes["updated_at"] = datetime.utcnow()
+                await existing.set(changes)
+                updated_count += 1
+            touched.add(pair)
+        except Exception as save_error:
+            logger.error("Failed to save supplier '%s' to database: %s", supplier.name, save_error)
+        finally:
+            if on_progress is not None:
+                await on_progress(i + 1)
+
+    for key, country in touched:
+        await supplier_cache.invalidate(key, country)
+        try:
+            await refresh_supplier_summary(key, country)
+        except Exception as summary_error:
+            logger.error("Failed to refresh supplier summary for %s in %s: %s", key, country, summary_error)
+
+    logger.info("Saved suppliers to database: %s new, %s updated, %s extracted", created_count, updated_count, len(suppliers))
+    return created_count + updated_count
+
+
+def _match_existing(supplier: Supplier, existing: List[Supplier]) -> Optional[Supplier]:
+    keys = {supplier_identity(supplier.name, supplier.website), supplier_identity(supplier.name)}
+    for candidate in existing:
+        if keys & {supplier_identity(candidate.name, candidate.website), supplier_identity(candidate.name)}:
+            return candidate
+    return None
+
+
+def _merge_changes(supplier: Supplier, existing: Supplier) -> Dict[str, Any]:
+    changes = {}
+    for field in SUPPLIER_FACT_FIELDS:
+        if field not in supplier.model_fields_set:
+            continue
+        value = getattr(supplier, field)
+        if value is None or value == getattr(existing, field):
+            continue
+        if field == "certifications":
+            # Certifications accumulate; a delta only reports the new ones
+            value = sorted(set(existing.certifications or []) | set(value))
+            if value == sorted(existing.certifications or []):
+                continue
+        changes[field] = value
+    return changes
@@ -1,149 +1,369 @@
-from celery import Celery
+from celery.signals import setup_logging, worker_process_shutdown
+import asyncio
 import os
-from dotenv import load_dotenv
 import logging
-import sys
 import json
-from datetime import datetime
+import math
+import socket
+import uuid
+from datetime import datetime, timedelta
 from beanie import PydanticObjectId
 
-# Configure logging for Celery worker
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler("worker.log"),
-        logging.StreamHandler(sys.stdout)
-    ]
-)
+from app.canonical import component_key
+from app.clients import get_anthropic_client, get_celery_app
+from app.logging_config import configure_logging, shutdown_logging, task_id_var
+from app.settings import get_settings
+
 logger = logging.getLogger(__name__)
 
-# Load environment variables - make sure it happens BEFORE creating the Celery app
-load_dotenv()
-
-# Verify API key is available and log (without revealing the full key)
-ANTHROPIC_API_KEY = os.getenv("ANTHROPIC_API_KEY")
-if ANTHROPIC_API_KEY:
-    masked_key = ANTHROPIC_API_KEY[:4] + "..." + ANTHROPIC_API_KEY[-4:]
-    logger.info(f"Anthropic API key loaded: {masked_key}")
-else:
-    logger.error("ANTHROPIC_API_KEY not found in environment variables!")
-
-# Create Celery instance
-celery_app = Celery(
-    "procurement_assistant",
-    broker=os.getenv("REDIS_URL", "redis://localhost:6379/0"),
-    backend=os.getenv("REDIS_URL", "redis://localhost:6379/0")
+@setup_logging.connect
+def configure_worker_logging(**kwargs):
+    """Replace Celery's logging setup with the queue-backed structured pipeline."""
+    configure_logging(service="worker", log_file="worker.log")
+
+@worker_process_shutdown.connect
+def flush_worker_logging(**kwargs):
+    """Prefork children exit without running atexit hooks, so flush their queued records here."""
+    shutdown_logging()
+
+# Celery instance shared with the API, which only uses it to publish tasks
+celery_app = get_celery_app()
+
+# Acknowledge tasks only once they finish, so the broker redelivers the tasks of a
+# worker that crashed; the task lease and stage checkpoints make redelivery safe
+celery_app.conf.update(
+    task_acks_late=True,
+    task_reject_on_worker_lost=True,
+    worker_prefetch_multiplier=1,
 )
 
+# Periodic jobs, run by `celery -A app.worker beat`
+celery_app.conf.beat_schedule = {
+    "refresh-popular-queries": {
+        "task": "refresh_popular_queries",
+        "schedule": get_settings().refresh_interval_minutes * 60,
+    },
+    "apply-retention": {
+        "task": "apply_retention",
+        "schedule": get_settings().retention_interval_hours * 3600,
+    },
+}
+
+# Process-wide event loop so the Mongo client and Beanie are initialized once per worker process
+_event_loop = None
+
+def run_async(coro):
+    """Run a coroutine on this worker process's persistent event loop."""
+    global _event_loop
+    if _event_loop is None or _event_loop.is_closed():
+        _event_loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(_event_loop)
+    return _event_loop.run_until_complete(coro)
+
 # Import these here to avoid circular imports
-from app.models.task import SupplierTask, TaskStatus
+from app.models.supplier import Supplier
+from app.models.search_result import SearchResult
+from app.models.task import CountryProgress, SupplierTask, TaskStatus
+
+def _is_retriable(error: Exception) -> bool:
+    """Temporary upstream failures (like an API 500) are worth retrying."""
+    return "500" in str(error) or "Internal server error" in str(error)
+
+async def _update_country_progress(task: SupplierTask, country: str, **fields):
+    """
+    Atomically update one country's progress, so concurrently finishing countries
+    don't overwrite each other. Single-country tasks mirror it on the task itself.
+    """
+    update = {f"country_progress.$.{name}": value for name, value in fields.items()}
+    if len(task.all_countries) == 1:
+        update.update({name: value for name, value in fields.items() if name in ("message", "search_result_id")})
+    await SupplierTask.get_motor_collection().update_one(
+        {"_id": task.id, "country_progress.country": country},
+        {"$set": update}
+    )
+
+async def _claim_task(task_id: str, owner: str) -> bool:
+    """
+    Atomically take the lease on a task that is neither finished nor leased. Fails for a
+    delivery of a task that is already done, or whose lease has not run out yet (a
+    worker still processing it, or one that died less than a lease ago).
+    """
+    now = datetime.utcnow()
+    claimed = await SupplierTask.get_motor_collection().find_one_and_update(
+        {
+            "_id": PydanticObjectId(task_id),
+            "status": {"$in": [TaskStatus.QUEUED.value, TaskStatus.PROCESSING.value]},
+            "$or": [{"lease_expires_at": None}, {"lease_expires_at": {"$lte": now}}],
+        },
+        {"$set": {"lease_owner": owner, "lease_expires_at": now + timedelta(seconds=get_settings().task_lease_seconds)}},
+        projection={"_id": 1}
+    )
+    return claimed is not None
+
+async def _keep_lease(task: SupplierTask, owner: str):
+    """Renew the lease while the task is processed."""
+    lease_seconds = get_settings().task_lease_seconds
+    while True:
+        await asyncio.sleep(lease_seconds / 3)
+        task.lease_expires_at = datetime.utcnow() + timedelta(seconds=lease_seconds)
+        await SupplierTask.get_motor_collection().update_one(
+            {"_id": task.id, "lease_owner": owner},
+            {"$set": {"lease_expires_at": task.lease_expires_at}}
+        )
 
 @celery_app.task(name="process_supplier_query", bind=True, max_retries=2)
-def process_supplier_query(self, task_id, component, country):
+def process_supplier_query(self, task_id, component, country, countries=None):
     """
     Celery task to process a supplier query asynchronously.
+    With several countries the per-country searches run concurrently, bounded by the
+    shared search rate limit, and each country's progress is saved as soon as it finishes.
+
+    Each country checkpoints its stages (search result, extracted suppliers, number of
+    suppliers saved). A retry, or a redelivery after a worker crash, resumes every country
+    from its last completed stage, so the web search and extraction are never repeated.
     """
-    logger.info(f"Starting Celery task processing for task {task_id}")
+    task_id_token = task_id_var.set(task_id)
+    logger.info("Starting Celery task processing for task %s", task_id)
 
-    # We need to set up a new event loop for async operations within Celery
-    import asyncio
-    
-    async def _process_task():
+    async def _process_country(task, country):
+        from app.ai.web_search import search_suppliers
+        from app.ai.summarizer import process_search_result
+        from app.analytics import refresh_supplier_summary
+        from app.cache import supplier_cache
+        from app.retention import restore_search_result
+        from app.suppliers import find_known_suppliers, known_supplier_identities, save_suppliers
+        
+        # Checkpoints left by a previous attempt (retry or crashed worker)
+        progress = task.progress_for(country)
+        try:
+            known = await find_known_suppliers(component, country)
+            
+            # Step 1: Use AI to search for suppliers, unless a previous attempt already did
+            search_result = await SearchResult.get(progress.search_result_id) if progress.search_result_id else None
+            if search_result is not None:
+                logger.info("Resuming %s in %s from search result %s", component, country, search_result.id)
+                search_result = await restore_search_result(search_result)
+            else:
+                # Re-runs only ask for suppliers we don't have yet and for changed facts
+                known_identities = [] if task.full_refresh else known_supplier_identities(known)
+                if known_identities:
+                    message = f"Starting incremental supplier search against {len(known_identities)} known suppliers..."
+                else:
+                    message = "Starting supplier search with Claude AI..."
+                await _update_country_progress(task, country, status=TaskStatus.PROCESSING.value, message=message)
+                
+                search_result = await search_suppliers(component=component, country=country, known_suppliers=known_identities)
+                await search_result.create()
+                await _update_country_progress(
+                    task, country,
+                    search_result_id=search_result.id,
+                    message="Web search completed, extracting supplier information..."
+                )
+            
+            # Step 2: Process search results into structured suppliers, unless already extracted
+            if progress.extracted_count is not None and search_result.extracted_suppliers is not None:
+                suppliers = [Supplier(**facts) for facts in search_result.extracted_suppliers]
+            else:
+                suppliers = await process_search_result(search_result)
+                # Only the fields set by extraction are kept (raw_ai_source included), so a
+                # resumed attempt rebuilds the same suppliers and merges still only apply extracted facts
+                search_result.extracted_suppliers = [
+                    supplier.model_dump(exclude_unset=True, exclude={"id", "revision_id"})
+                    for supplier in suppliers
+                ]
+                await search_result.save()
+                await _update_country_progress(
+                    task, country,
+                    status=TaskStatus.PROCESSING.value,
+                    extracted_count=len(suppliers),
+                    message=f"Extracted {len(suppliers)} suppliers, saving..."
+                )
+            
+            # Step 3: Merge suppliers into the database (also invalidates cached listings),
+            # skipping those a previous attempt already saved
+            persisted = min(progress.persisted_count, len(suppliers))
+            
+            async def _record_persisted(count):
+                await _update_country_progress(task, country, persisted_count=persisted + count)
+            
+            saved_count = await save_suppliers(suppliers[persisted:], known=known, on_progress=_record_persisted)
+            if persisted:
+                # The interrupted attempt may have stopped before invalidating its writes
+                await supplier_cache.invalidate(component_key(component), country)
+                await refresh_supplier_summary(component_key(component), country)
+            
+            await _update_country_progress(
+                task, country,
+                status=TaskStatus.COMPLETED.value,
+                message=f"Found {len(suppliers)} suppliers, saved {saved_count} new or updated.",
+                supplier_count=await Supplier.find({"component_key": component_key(component), "country": country}).count(),
+                completed_at=datetime.now()
+            )
+            logger.info("Finished %s in %s for task %s", component, country, task_id)
+            return len(suppliers), saved_count
+        except Exception as e:
+            logger.error("Error processing %s in %s for task %s: %s", component, country, task_id, e)
+            await _update_country_progress(
+                task, country,
+                status=TaskStatus.FAILED.value,
+                message=f"Failed: {str(e)}",
+                completed_at=datetime.now()
+            )
+            raise
+
+    async def _run():
         # Initialize the database connection
         from app.db import init_db
         await init_db()
         
-        # Get the task
-        task = await SupplierTask.get(PydanticObjectId(task_id))
-        if not task:
-            logger.error(f"Task {task_id} not found for processing")
-            return
+        # Guard against the broker delivering the same task twice. Returns the seconds to
+        # wait before trying again when another lease is still running, otherwise None.
+        owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        if not await _claim_task(task_id, owner):
+            task = await SupplierTask.get(PydanticObjectId(task_id))
+            if not task:
+                logger.error("Task %s not found for processing", task_id)
+                return None
+            if task.status in (TaskStatus.COMPLETED, TaskStatus.FAILED):
+                logger.warning("Task %s was already processed (%s), ignoring redelivery", task_id, task.status.value)
+                return None
+            # The lease holder may be alive (duplicate delivery) or may have died (redelivery
+            # after a crash): only the lease running out tells, so come back after it
+            lease_left = (task.lease_expires_at - datetime.utcnow()).total_seconds() if task.lease_expires_at else 0
+            countdown = max(1, math.ceil(lease_left) + 1)
+            logger.warning("Task %s is leased by %s, trying again in %s seconds", task_id, task.lease_owner, countdown)
+            return countdown
         
+        task = await SupplierTask.get(PydanticObjectId(task_id))
+        heartbeat = asyncio.ensure_future(_keep_lease(task, owner))
+        try:
+            await _process_task(task)
+        finally:
+            heartbeat.cancel()
+        return None
+
+    async def _process_task(task):
         try:
             # Update status to processing
             task.status = TaskStatus.PROCESSING
             task.message = "Starting supplier search with Claude AI..."
+            if not task.country_progress:
+                # Queued before per-country progress was recorded
+                task.countries = countries or [country]
+                task.country_progress = [CountryProgress(country=name) for name in task.countries]
             await task.save()
             
-            # Step 1: Use AI to search for suppliers
-            from app.ai.web_search import search_suppliers
+            # Fail fast with a configuration error if the API key is missing
+            get_anthropic_client()
             
-            # Verify environment variable is still available here
-            from anthropic import Anthropic
-            anthropic_key = os.getenv("ANTHROPIC_API_KEY")
-            if not anthropic_key:
-                raise ValueError("ANTHROPIC_API_KEY is missing in the environment")
-                
-            # Log key availability (without revealing the full key)
-            masked_key = anthropic_key[:4] + "..." + anthropic_key[-4:] if anthropic_key else "None"
-            logger.info(f"Using Anthropic API key: {masked_key}")
-            
-            # Continue with the search
-            search_result = await search_suppliers(component=component, country=country)
-            await search_result.create()
-            
-            # Update task with search result ID
-            task.search_result_id = search_result.id
-            task.message = "Web search completed, extracting supplier information..."
-            await task.save()
+            pending = [progress.country for progress in task.country_progress if progress.status != TaskStatus.COMPLETED]
+            if len(pending) > 1:
+                logger.info("Searching %s countries concurrently for task %s", len(pending), task_id)
+            outcomes = await asyncio.gather(*(_process_country(task, name) for name in pending), return_exceptions=True)
             
-            # Step 2: Process search results into structured suppliers
-            from app.ai.summarizer import process_search_result
-            suppliers = await process_search_result(search_result)
+            for outcome in outcomes:
+                if isinstance(outcome, BaseException) and not isinstance(outcome, Exception):
+                    # Worker shutdown and the like: leave the checkpoints for the redelivery
+                    raise outcome
             
-            # Step 3: Save suppliers to database
-            saved_count = 0
-            for supplier in suppliers:
-                try:
-                    await supplier.create()
-                    saved_count += 1
-                except Exception as save_error:
-                    logger.error(f"Failed to save supplier '{supplier.name}' to database: {str(save_error)}")
+            # Pick up the per-country progress written while the countries ran
+            await task.sync()
+            errors = [outcome for outcome in outcomes if isinstance(outcome, Exception)]
+            completed = [progress.country for progress in task.country_progress if progress.status == TaskStatus.COMPLETED]
+            retriable = [error for error in errors if _is_retriable(error)]
+            if retriable and self.request.retries < self.max_retries:
+                raise retriable[0]
+            if errors and not completed:
+                raise errors[0]
             
             # Mark task as completed
-            task.status = TaskStatus.COMPLETED
-            task.message = f"Task completed successfully. Found {len(suppliers)} suppliers, saved {saved_count}."
-            task.supplier_count = saved_count
-            task.completed_at = datetime.now()
+            found = sum(outcome[0] for outcome in outcomes if not isinstance(outcome, Exception))
+            saved_count = sum(outcome[1] for outcome in outcomes if not isinstance(outcome, Exception))
+            message = f"Task completed successfully. Found {found} suppliers, saved {saved_count} new or updated."
+            failed = [progress.country for progress in task.country_progress if progress.status == TaskStatus.FAILED]
+            if failed:
+                message += f" Failed for: {', '.join(failed)}."
+            task.finish(TaskStatus.COMPLETED, message)
+            # The task's results are all suppliers now stored for its countries
+            task.supplier_count = await Supplier.find({"component_key": component_key(component), "country": {"$in": task.all_countries}}).count()
             await task.save()
             
-            logger.info(f"Task {task_id} completed successfully. Processed {len(suppliers)} suppliers.")
+            logger.info("Task %s completed successfully. Processed %s suppliers.", task_id, found)
             
         except ValueError as e:
             # Handle configuration errors
             error_message = f"Configuration error: {str(e)}"
             logger.error(error_message)
             
-            task.status = TaskStatus.FAILED
-            task.message = f"Failed: {error_message}"
-            task.completed_at = datetime.now()
+            task.finish(TaskStatus.FAILED, f"Failed: {error_message}")
             await task.save()
             
         except Exception as e:
             import traceback
             error_traceback = traceback.format_exc()
-            logger.error(f"Error processing task {task_id}: {str(e)}")
-            logger.debug(f"Full traceback: {error_traceback}")
+            logger.error("Error processing task %s: %s", task_id, e)
+            logger.debug("Full traceback: %s", error_traceback)
             
             # Check if this is a retriable error (like a temporary API issue)
-            if "500" in str(e) or "Internal server error" in str(e):
-                try:
-                    # Update task status to show retry attempt
-                    task.message = f"Temporary error occurred, will retry: {str(e)}"
-                    await task.save()
-                    
-                    # Retry the task
-                    self.retry(countdown=10, exc=e)  # Retry after 10 seconds
-                    return
-                except self.MaxRetriesExceededError:
-                    task.message = f"Failed after multiple retry attempts: {str(e)}"
-            
-            task.status = TaskStatus.FAILED
-            task.message = f"Failed: {str(e)}"
-            task.completed_at = datetime.now()
+            # Celery re-raises the original exception instead of MaxRetriesExceededError
+            # when exc is passed, so the retry budget is checked here
+            if _is_retriable(e) and self.request.retries < self.max_retries:
+                # Update task status to show retry attempt, and let the retry take the lease
+                task.message = f"Temporary error occurred, will retry: {str(e)}"
+                task.lease_owner = None
+                task.lease_expires_at = None
+                await task.save()
+                
+                # Retry the task
+                self.retry(countdown=10, exc=e)  # Retry after 10 seconds
+                return
+            
+            if _is_retriable(e):
+                task.finish(TaskStatus.FAILED, f"Failed after {self.request.retries + 1} attempts: {str(e)}")
+            else:
+                task.finish(TaskStatus.FAILED, f"Failed: {str(e)}")
             await task.save()
     
-    # Run the async function in a new event loop
-    asyncio.run(_process_task())
-    return f"Completed processing of task {task_id}"
\ No newline at end of file
+    # Run the async function on the worker's event loop
+    try:
+        countdown = run_async(_run())
+        if countdown is not None:
+            # Deliver the same task again (same id and retry count) once the lease ran out;
+            # this delivery is then acknowledged
+            self.signature_from_request(countdown=countdown, retries=self.request.retries).apply_async()
+            return f"Task {task_id} is leased by another worker, rescheduled in {countdown} seconds"
+    finally:
+        task_id_var.reset(task_id_token)
+    return f"Completed processing of task {task_id}"
+
+@celery_app.task(name="refresh_popular_queries")
+def refresh_popular_queries():
+    """
+    Periodic task that refreshes the most requested queries before their data goes stale.
+    """
+    from app.db import init_db
+    from app.refresh import refresh_popular_queries as _refresh_popular_queries
+
+    async def _refresh():
+        await init_db()
+        return await _refresh_popular_queries()
+
+    summary = run_async(_refresh())
+    logger.info("Popular query refresh checked %s queries, queued %s", summary["checked"], len(summary["queued"]))
+    return summary
+
+@celery_app.task(name="apply_retention")
+def apply_retention():
+    """
+    Periodic task that expires finished tasks and archives old search result payloads.
+    """
+    from app.db import init_db
+    from app.retention import apply_retention as _apply_retention
+
+    async def _apply():
+        await init_db()
+        return await _apply_retention()
+
+    report = run_async(_apply())
+    logger.info("Retention archived %s search results, reclaimed %s bytes", report["search_results"]["archived"], report["search_results"]["collection"]["reclaimed_bytes"])
+    return report
@@ -0,0 +1,51 @@
+"""
+Measure cold start time of the API and worker modules in fresh interpreters.
+
+Each run spawns a new Python process, imports the module and, for the API, builds the
+ASGI app object, which is what an autoscaled pod does before it can become ready.
+Run from the backend directory:
+
+    python -m benchmarks.bench_startup --runs 5
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+TARGETS = {
+    "api (app.main)": "import app.main",
+    "worker (app.worker)": "import app.worker",
+    "routes (app.routes.discovery)": "import app.routes.discovery",
+}
+
+SNIPPET = "import time; t = time.perf_counter(); {statement}; print(time.perf_counter() - t)"
+
+
+def measure(statement: str, runs: int) -> list:
+    env = dict(os.environ)
+    env.setdefault("ANTHROPIC_API_KEY", "bench-placeholder-key")
+    env.setdefault("LOG_LEVEL", "WARNING")
+    timings = []
+    for _ in range(runs):
+        output = subprocess.run(
+            [sys.executable, "-c", SNIPPET.format(statement=statement)],
+            capture_output=True, text=True, check=True, env=env,
+        ).stdout.strip().splitlines()
+        timings.append(float(output[-1]) * 1000)
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"Cold import time over {args.runs} fresh interpreters")
+    for name, statement in TARGETS.items():
+        timings = measure(statement, args.runs)
+        print(f"{name:<32} median={statistics.median(timings):8.1f}ms  min={min(timings):8.1f}ms  max={max(timings):8.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,20 @@
+#!/bin/bash
+
+# Make sure we're in the right directory
+cd "$(dirname "$0")"
+
+# Activate virtual environment if it exists
+if [ -d "venv" ]; then
+    echo "Activating virtual environment..."
+    source venv/bin/activate
+fi
+
+# Load environment variables specifically for Celery
+if [ -f "celery.env" ]; then
+    echo "Loading Celery environment variables..."
+    export $(grep -v '^#' celery.env | xargs)
+fi
+
+# Start Celery beat to schedule periodic jobs (popular query refresh)
+echo "Starting Celery beat..."
+celery -A app.worker beat --loglevel=info
@@ -0,0 +1,52 @@
+import pytest
+
+from app.canonical import DEFAULT_SYNONYMS, QueryCanonicalizer
+
+
+def make_canonicalizer():
+    # Independent of QUERY_SYNONYMS_FILE and QUERY_SIMILARITY_THRESHOLD in the environment
+    return QueryCanonicalizer(synonyms=DEFAULT_SYNONYMS, similarity_threshold=0.75)
+
+
+@pytest.fixture
+def canonicalizer():
+    canonicalizer = make_canonicalizer()
+    canonicalizer.register("AC compressor")
+    return canonicalizer
+
+
+@pytest.mark.parametrize("component", [
+    "AC compressor",
+    "air-conditioner compressors",
+    "compressor (HVAC)",
+    "Compressors for air conditioning",
+    "AC compresor",
+])
+def test_variants_match_known_component(canonicalizer, component):
+    assert canonicalizer.match(component) == "AC compressor"
+
+
+@pytest.mark.parametrize("known, query", [
+    ("1000W inverter", "100W inverter"),
+    ("600V film capacitor", "60V film capacitor"),
+    ("aluminum extrusion 6061", "aluminum extrusion 6063"),
+    ("capacitor 100uF", "capacitor 10uF"),
+    ("refrigerator compressor", "refrigerator compressors 220V"),
+])
+def test_different_specifications_do_not_match(known, query):
+    canonicalizer = make_canonicalizer()
+    canonicalizer.register(known)
+    assert canonicalizer.match(query) is None
+    assert canonicalizer.match(known) == known
+
+
+def test_typo_keeps_specification(canonicalizer):
+    canonicalizer.register("220V refrigerator compressor")
+    assert canonicalizer.match("220V refrigerator compresor") == "220V refrigerator compressor"
+    assert canonicalizer.match("110V refrigerator compresor") is None
+
+
+def test_variants_share_component_key():
+    canonicalizer = make_canonicalizer()
+    keys = {canonicalizer.canonical_key(component) for component in ("AC compressor", "air-conditioner compressors", "compressor (HVAC)")}
+    assert keys == {"ac compressor"}